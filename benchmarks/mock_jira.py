@@ -0,0 +1,303 @@
+"""
+In-process stand-in for the Jira REST API, for offline benchmarks.
+
+Implements the endpoints this tool uses: search, issue (GET/POST/PUT),
+issue/bulk, issueLink, field, issuetype, issueLinkType and the agile
+sprint/board endpoints. JQL support covers the queries the tool sends
+(project, issuetype in, key in, summary/description ~, updated >=).
+Latency and HTTP 429 responses can be injected to exercise retry and
+rate-limit handling.
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+EPIC_LINK_FIELD = "customfield_10014"
+JQL_DATE_FORMAT = "%Y/%m/%d %H:%M"
+
+
+class MockJira:
+    """Issue store plus request counters. All public methods are thread-safe."""
+
+    def __init__(self, latency=0.0, throttle_every=0, retry_after=0):
+        self.lock = threading.RLock()
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.issues = {}
+        self.links = {}      # key -> list of (link type, "inward"/"outward", other key)
+        self.children = {}   # parent key -> sub-task keys
+        self.sprints = {}    # sprint id -> issue keys
+        self.counters = {}   # project -> last issue number
+        self.calls = {}
+        self.total_calls = 0
+        self.throttled = 0
+        self.version = 0     # bumped on every write; keys the search cache
+        self._search_cache = None
+        self._server = None
+
+    # ------------------------------------------------------------
+    # Store
+    # ------------------------------------------------------------
+    def add_issue(self, project, summary, issue_type, epic=None, parent=None, description=None):
+        with self.lock:
+            self.counters[project] = self.counters.get(project, 0) + 1
+            key = f"{project}-{self.counters[project]}"
+            self.version += 1
+            self.issues[key] = {
+                "project": project,
+                "summary": summary,
+                "type": issue_type,
+                "epic": epic,
+                "parent": parent,
+                "description": description,
+                "updated": time.time(),
+            }
+            if parent:
+                self.children.setdefault(parent, []).append(key)
+            return key
+
+    def add_link(self, inward, outward, link_type="Needs"):
+        with self.lock:
+            self.version += 1
+            self.links.setdefault(inward, []).append((link_type, "outward", outward))
+            self.links.setdefault(outward, []).append((link_type, "inward", inward))
+
+    def add_sprint(self, sprint_id, keys):
+        with self.lock:
+            self.sprints[str(sprint_id)] = list(keys)
+
+    def issue_json(self, key, fields=None):
+        issue = self.issues[key]
+        wanted = set(fields.split(",")) if fields else None
+
+        def want(name):
+            return wanted is None or name in wanted or "*all" in wanted
+
+        f = {}
+        if want("summary"):
+            f["summary"] = issue["summary"]
+        if want("description"):
+            f["description"] = issue["description"]
+        if want("issuetype"):
+            f["issuetype"] = {"name": issue["type"]}
+        if want("status"):
+            f["status"] = {"name": "Open"}
+        if want(EPIC_LINK_FIELD):
+            f[EPIC_LINK_FIELD] = issue["epic"]
+        if want("parent"):
+            f["parent"] = {"key": issue["parent"]} if issue["parent"] else None
+        if want("updated"):
+            f["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S.000+0000", time.gmtime(issue["updated"]))
+        if want("issuelinks"):
+            f["issuelinks"] = [
+                {"type": {"name": t}, f"{direction}Issue": {"key": other}}
+                for t, direction, other in self.links.get(key, [])
+            ]
+        if want("subtasks"):
+            f["subtasks"] = [
+                {"key": k, "fields": {"summary": self.issues[k]["summary"]}}
+                for k in self.children.get(key, [])
+            ]
+        return {"id": key.split("-")[1], "key": key, "fields": f}
+
+    def search(self, jql):
+        """Return matching keys in key order, reusing the result across pages."""
+        if self._search_cache and self._search_cache[0] == (jql, self.version):
+            return self._search_cache[1]
+        keys = self._search(jql)
+        self._search_cache = ((jql, self.version), keys)
+        return keys
+
+    def _search(self, jql):
+        keys = list(self.issues)
+        m = re.search(r'project\s*=\s*"?([A-Z][A-Z0-9_]*)"?', jql)
+        if m:
+            keys = [k for k in keys if self.issues[k]["project"] == m.group(1)]
+        m = re.search(r'\bkey\s+in\s*\(([^)]*)\)', jql)
+        if m:
+            wanted = {x.strip().strip('"') for x in m.group(1).split(",")}
+            keys = [k for k in keys if k in wanted]
+        m = re.search(r'issuetype\s+in\s*\(([^)]*)\)', jql)
+        if m:
+            wanted = {x.strip().strip('"').lower() for x in m.group(1).split(",")}
+            keys = [k for k in keys if self.issues[k]["type"].lower() in wanted]
+        m = re.search(r'\bkey\s*>\s*"?([A-Z][A-Z0-9_]*-\d+)"?', jql)
+        if m:
+            after = int(m.group(1).split("-")[1])
+            keys = [k for k in keys if int(k.split("-")[1]) > after]
+        text_fields = re.findall(r'(summary|description)\s*~\s*"((?:[^"\\]|\\.)*)"', jql)
+        if text_fields:
+            def matches(k):
+                issue = self.issues[k]
+                return any(term.replace('\\"', '"').lower() in (issue[field] or "").lower()
+                           for field, term in text_fields)
+            keys = [k for k in keys if matches(k)]
+        m = re.search(r'updated\s*>=\s*"([^"]+)"', jql)
+        if m:
+            relative = re.fullmatch(r"-(\d+)m", m.group(1))
+            since = time.time() - int(relative.group(1)) * 60 if relative else \
+                time.mktime(time.strptime(m.group(1), JQL_DATE_FORMAT))
+            keys = [k for k in keys if self.issues[k]["updated"] >= since]
+        return keys
+
+    # ------------------------------------------------------------
+    # Server
+    # ------------------------------------------------------------
+    def start(self, port=0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def count(self, method, path):
+        template = re.sub(r"/[A-Z][A-Z0-9_]*-\d+", "/{key}", path)
+        template = re.sub(r"/(sprint|board)/\d+", r"/\1/{id}", template)
+        with self.lock:
+            name = f"{method} {template}"
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.total_calls += 1
+            throttle = self.throttle_every and self.total_calls % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+            return throttle
+
+
+def _make_handler(jira):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        wbufsize = 65536  # send headers and body in one segment
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, status, body=None, headers=None):
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def handle_call(self):
+            url = urlparse(self.path)
+            payload = self.body() if self.command in ("POST", "PUT") else None
+            if jira.count(self.command, url.path):
+                self.send(429, {"errorMessages": ["Rate limit exceeded"]}, {"Retry-After": str(jira.retry_after)})
+                return
+            if jira.latency:
+                time.sleep(jira.latency)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            with jira.lock:
+                status, body = route(jira, self.command, url.path, query, payload)
+            self.send(status, body)
+
+        do_GET = do_POST = do_PUT = handle_call
+
+    return Handler
+
+
+def _page(items, query):
+    start = int(query.get("startAt", 0))
+    size = min(int(query.get("maxResults", 50)), 1000)
+    return start, size, items[start:start + size]
+
+
+def _create(jira, fields):
+    if not fields.get("summary"):
+        return None, {"errors": {"summary": "You must specify a summary of the issue."}}
+    key = jira.add_issue(
+        fields["project"]["key"],
+        fields["summary"],
+        fields["issuetype"]["name"],
+        epic=fields.get(EPIC_LINK_FIELD),
+        parent=(fields.get("parent") or {}).get("key"),
+        description=fields.get("description"),
+    )
+    return key, None
+
+
+def route(jira, method, path, query, payload):
+    if method == "GET":
+        if path == "/rest/api/2/field":
+            return 200, [{"id": "summary", "name": "Summary"}, {"id": EPIC_LINK_FIELD, "name": "Epic Link"}]
+        if path == "/rest/api/2/issuetype":
+            return 200, [{"name": n} for n in ("Epic", "Story", "Task", "Sub Task", "Bug")]
+        if path == "/rest/api/2/issueLinkType":
+            return 200, {"issueLinkTypes": [{"name": "Needs"}, {"name": "Blocks"}, {"name": "Relates"}]}
+        if path == "/rest/api/2/search":
+            matched = jira.search(query.get("jql", ""))
+            start, size, keys = _page(matched, query)
+            return 200, {"startAt": start, "maxResults": size, "total": len(matched),
+                         "issues": [jira.issue_json(k, query.get("fields")) for k in keys]}
+        m = re.match(r"^/rest/api/2/issue/([A-Z][A-Z0-9_]*-\d+)$", path)
+        if m:
+            if m.group(1) not in jira.issues:
+                return 404, {"errorMessages": ["Issue Does Not Exist"]}
+            return 200, jira.issue_json(m.group(1), query.get("fields"))
+        m = re.match(r"^/rest/agile/1\.0/sprint/(\d+)/issue$", path)
+        if m:
+            keys = jira.sprints.get(m.group(1), [])
+            if query.get("jql"):
+                matched = set(jira.search(query["jql"]))
+                keys = [k for k in keys if k in matched]
+            start, size, page = _page(keys, query)
+            return 200, {"startAt": start, "maxResults": size, "total": len(keys),
+                         "issues": [jira.issue_json(k, query.get("fields")) for k in page]}
+        m = re.match(r"^/rest/agile/1\.0/board/(\d+)/sprint$", path)
+        if m:
+            sprints = [{"id": int(s), "name": f"Sprint {s}", "state": "active"} for s in sorted(jira.sprints)]
+            start, size, page = _page(sprints, query)
+            return 200, {"startAt": start, "maxResults": size, "isLast": start + size >= len(sprints), "values": page}
+
+    if method == "POST":
+        if path == "/rest/api/2/issue":
+            key, error = _create(jira, payload["fields"])
+            if error:
+                return 400, error
+            return 201, {"id": key.split("-")[1], "key": key}
+        if path == "/rest/api/2/issue/bulk":
+            issues, errors = [], []
+            for n, update in enumerate(payload.get("issueUpdates", [])[:50]):
+                key, error = _create(jira, update["fields"])
+                if error:
+                    errors.append({"status": 400, "elementErrors": error, "failedElementNumber": n})
+                else:
+                    issues.append({"id": key.split("-")[1], "key": key})
+            return (201 if issues else 400), {"issues": issues, "errors": errors}
+        if path == "/rest/api/2/issueLink":
+            inward, outward = payload["inwardIssue"]["key"], payload["outwardIssue"]["key"]
+            if inward not in jira.issues or outward not in jira.issues:
+                return 404, {"errorMessages": ["Issue Does Not Exist"]}
+            jira.add_link(inward, outward, payload["type"]["name"])
+            return 201, None
+
+    if method == "PUT":
+        m = re.match(r"^/rest/api/2/issue/([A-Z][A-Z0-9_]*-\d+)$", path)
+        if m and m.group(1) in jira.issues:
+            issue = jira.issues[m.group(1)]
+            for name, value in payload.get("fields", {}).items():
+                if name == EPIC_LINK_FIELD:
+                    issue["epic"] = value
+                elif name in ("summary", "description"):
+                    issue[name] = value
+            issue["updated"] = time.time()
+            jira.version += 1
+            return 204, None
+
+    return 404, {"errorMessages": [f"No mock for {method} {path}"]}
@@ -0,0 +1,286 @@
+"""
+Offline benchmarks for jira-epic-story-sync against the local mock Jira.
+
+Each scenario seeds a fresh mock, runs the real sync code in a child process
+(so caches and module state never leak between runs) and reports requests,
+wall time and the child's peak resident memory (not available on Windows).
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scenarios csv --sizes 1000 --latency 0.02
+    python benchmarks/run_benchmarks.py --output base.json
+    python benchmarks/run_benchmarks.py --baseline base.json --tolerance 0.15
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_jira import MockJira
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+PROJECT = "BENCH"
+UPPER_PROJECT = "UP"
+SPRINT_ID = 100
+BOARD_ID = 1
+BOARD_SPRINTS = 15
+CSV_HEADER = ["Epic", "Epic_Summary(customfield_10004)", "Epic_Upper_Link",
+              "Story", "Story_Description(description)", "Story_Upper_Link", "RE_Task"]
+
+ROWS_PER_EPIC = 100
+ROWS_PER_STORY = 4
+UPPER_LINK_EVERY = 10
+EXISTING_SUBTASK = "[Task] Implement"
+OLD_TEXT = "legacy"
+NEW_TEXT = "modern"
+
+
+# ------------------------------------------------------------
+# Scenario setup (runs in the parent, next to the mock server)
+# ------------------------------------------------------------
+def seed_csv(jira, size, workdir):
+    """
+    Write a CSV of `size` rows and pre-create part of it, so the run mixes
+    creates, epic-link updates, existing links and new links.
+    """
+    uppers = [jira.add_issue(UPPER_PROJECT, f"Upper {n}", "Epic") for n in range(10)]
+
+    epics = max(1, size // ROWS_PER_EPIC)
+    stories = max(1, size // ROWS_PER_STORY)
+    for n in range(epics // 2):
+        jira.add_issue(PROJECT, f"Epic {n}", "Epic", description=f"Epic {n} summary")
+    for n in range(0, stories, 4):
+        # Existing stories without an epic link: the sync has to relink them
+        jira.add_issue(PROJECT, f"Story {n}", "Story", description=f"Story {n} description")
+
+    path = os.path.join(workdir, "bench.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for row in range(size):
+            epic, story = row // ROWS_PER_EPIC, row // ROWS_PER_STORY
+            upper = uppers[row % len(uppers)] if row % UPPER_LINK_EVERY == 0 else ""
+            writer.writerow([f"Epic {epic}", f"Epic {epic} summary", upper,
+                             f"Story {story}", f"Story {story} description", upper,
+                             f"Task {row}"])
+    return {"csv_path": path}
+
+
+def seed_sprint(jira, size, workdir):
+    """One sprint of `size` stories; every third one already has its first sub-task."""
+    keys = []
+    for n in range(size):
+        key = jira.add_issue(PROJECT, f"Sprint story {n}", ("Story", "Task", "Bug")[n % 3])
+        if n % 3 == 0:
+            jira.add_issue(PROJECT, EXISTING_SUBTASK, "Sub Task", parent=key)
+        keys.append(key)
+    jira.add_sprint(SPRINT_ID, keys)
+    return {"sprint_id": SPRINT_ID}
+
+
+def seed_board(jira, size, workdir):
+    """The sprint scenario's `size` stories spread over BOARD_SPRINTS sprints of one board."""
+    seed_sprint(jira, size, workdir)
+    keys = jira.sprints.pop(str(SPRINT_ID))
+    for n in range(BOARD_SPRINTS):
+        jira.add_sprint(SPRINT_ID + n, keys[n::BOARD_SPRINTS])
+    return {"board_id": BOARD_ID}
+
+
+def seed_replace(jira, size, workdir):
+    """
+    `size` issues; half mention OLD_TEXT in the summary, a quarter in the
+    description, and every eighth has no description at all.
+    """
+    for n in range(size):
+        summary = f"Issue {n} {OLD_TEXT} flow" if n % 2 == 0 else f"Issue {n}"
+        description = f"Uses the {OLD_TEXT} API" if n % 4 == 1 else (None if n % 8 == 0 else f"Description {n}")
+        jira.add_issue(PROJECT, summary, "Task", description=description)
+    return {"old_text": OLD_TEXT, "new_text": NEW_TEXT}
+
+
+SCENARIOS = {
+    "csv": seed_csv,
+    "sprint": seed_sprint,
+    "board": seed_board,
+    "replace": seed_replace,
+}
+
+
+# ------------------------------------------------------------
+# Scenario execution (runs in the child, against the real code)
+# ------------------------------------------------------------
+def run_child(spec):
+    os.chdir(spec["workdir"])
+    sys.path.insert(0, REPO_DIR)
+
+    started = time.perf_counter()
+    if spec["scenario"] == "csv":
+        from csv_utils import process_csv
+        process_csv(PROJECT, spec["csv_path"], workers=spec["workers"])
+    elif spec["scenario"] == "sprint":
+        from board_utils import ensure_subtasks_for_sprint
+        ensure_subtasks_for_sprint(spec["sprint_id"])
+    elif spec["scenario"] == "board":
+        from board_utils import ensure_subtasks_for_sprints, get_board_sprint_ids
+        ensure_subtasks_for_sprints(get_board_sprint_ids(spec["board_id"]))
+    elif spec["scenario"] == "replace":
+        from text_utils import bulk_replace_text_in_project
+        bulk_replace_text_in_project(PROJECT, spec["old_text"], spec["new_text"])
+    wall = time.perf_counter() - started
+
+    with open(os.path.join(spec["workdir"], "result.json"), "w", encoding="utf-8") as f:
+        json.dump({"wall": wall, "peak_rss_bytes": peak_rss()}, f)
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, read once the run is over (tracing would skew the timing)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def run_scenario(scenario, size, args):
+    workdir = tempfile.mkdtemp(prefix=f"jira-bench-{scenario}-{size}-")
+    jira = MockJira(latency=args.latency, throttle_every=args.throttle_every)
+    spec = SCENARIOS[scenario](jira, size, workdir)
+    spec.update(scenario=scenario, workdir=workdir, workers=args.workers)
+
+    url = jira.start()
+    env = dict(os.environ,
+               JIRA_URL=url,
+               JIRA_TOKEN="benchmark",
+               JIRA_CACHE_DIR=os.path.join(workdir, "cache"),
+               JIRA_RATE_LIMIT=str(args.rate),
+               JIRA_METRICS_FILE="")
+    seeded = jira.total_calls
+    try:
+        with open(os.path.join(workdir, "output.log"), "w", encoding="utf-8") as log:
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(spec)],
+                                  env=env, stdout=log, stderr=subprocess.STDOUT)
+    finally:
+        jira.stop()
+
+    result = {"scenario": scenario, "size": size, "ok": proc.returncode == 0,
+              "requests": jira.total_calls - seeded, "throttled": jira.throttled,
+              "calls": dict(sorted(jira.calls.items())), "workdir": workdir}
+    if result["ok"]:
+        with open(os.path.join(workdir, "result.json"), encoding="utf-8") as f:
+            result.update(json.load(f))
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+# ------------------------------------------------------------
+# Reporting
+# ------------------------------------------------------------
+def print_results(results, verbose=False):
+    print(f"{'scenario':<10}{'size':>8}{'requests':>10}{'429s':>7}{'wall (s)':>10}{'req/s':>9}{'RSS MB':>9}")
+    for r in results:
+        if not r["ok"]:
+            print(f"{r['scenario']:<10}{r['size']:>8}  ❌ failed, see {r['workdir']}/output.log")
+            continue
+        rate = r["requests"] / r["wall"] if r["wall"] else 0
+        print(f"{r['scenario']:<10}{r['size']:>8}{r['requests']:>10}{r['throttled']:>7}"
+              f"{r['wall']:>10.2f}{rate:>9.0f}"
+              + (f"{r['peak_rss_bytes'] / 1e6:>9.1f}" if r["peak_rss_bytes"] is not None else f"{'n/a':>9}"))
+        if verbose:
+            for call, count in r["calls"].items():
+                print(f"{'':<18}{count:>10}  {call}")
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Compare against a saved run; a scenario regresses when requests, wall time
+    or peak memory grow by more than `tolerance`. Returns the regressions.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(b["scenario"], b["size"]): b for b in json.load(f)}
+
+    regressions = []
+    for r in results:
+        base = baseline.get((r["scenario"], r["size"]))
+        if not base or not base.get("ok"):
+            continue
+        if not r["ok"]:
+            regressions.append(f"{r['scenario']} {r['size']}: run failed")
+            continue
+        for metric in ("requests", "wall", "peak_rss_bytes"):
+            # Baselines saved before a metric existed (or where it is unavailable) skip it
+            if r.get(metric) is None or base.get(metric) is None:
+                continue
+            if r[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{r['scenario']} {r['size']}: {metric} {base[metric]:.6g} -> {r[metric]:.6g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local mock Jira.")
+    parser.add_argument("--scenarios", default="csv,sprint,board,replace",
+                        help="comma-separated scenarios: " + ", ".join(SCENARIOS))
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma-separated row / issue counts")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every mock response")
+    parser.add_argument("--throttle-every", type=int, default=0, help="answer every Nth request with HTTP 429")
+    parser.add_argument("--workers", type=int, default=8, help="--workers for the CSV sync")
+    parser.add_argument("--rate", type=float, default=0, help="JIRA_RATE_LIMIT for the client (0 disables)")
+    parser.add_argument("--output", help="save results as JSON")
+    parser.add_argument("--baseline", help="fail if results regress against this saved JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression ratio (default 0.10)")
+    parser.add_argument("--keep", action="store_true", help="keep each scenario's working directory")
+    parser.add_argument("--verbose", action="store_true", help="show per-endpoint request counts")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(json.loads(args.child))
+        return
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    for scenario in scenarios:
+        for size in sizes:
+            print(f"▶ {scenario} x {size} ...", flush=True)
+            results.append(run_scenario(scenario, size, args))
+
+    print()
+    print_results(results, args.verbose)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📊 Results saved to {args.output}")
+
+    failed = [r for r in results if not r["ok"]]
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f" - {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
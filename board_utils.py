@@ -1,13 +1,20 @@
-from jira_api import jira_request
-from datetime import datetime
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-# Configurable subtask templates
-REQUIRED_SUBTASKS = ["[Task] Implement", "[Task] Review", "[Task] Test"]
+from jira_api import jira_request, iter_board_sprints, iter_sprint_issues
+from issue_utils import BULK_CREATE_SIZE, build_issue_fields, create_issues_bulk
+from metrics_utils import instrumented
+from mirror_utils import mirror_for, project_of
+from template_utils import REQUIRED_SUBTASKS, reconcile_subtasks, template_for
+from text_utils import update_fields
 
-def get_sprint_issues(sprint_id, include_types=None):
+SUBTASK_FIX_WORKERS = 8  # parallel summary PUTs for --fix-drift
+
+def get_sprint_issues(sprint_id, include_types=None, verbose=True):
     """
     Get all Story, Task, and Bug issues from a given sprint (by sprint ID).
     This does NOT depend on board or sprint state.
+    verbose=False skips the per-issue listing.
 
     Example:
         get_sprint_issues(54188)
@@ -17,18 +24,14 @@ def get_sprint_issues(sprint_id, include_types=None):
 
     print(f"Fetching issues for sprint ID {sprint_id}...")
 
-    # Fetch all issues in the sprint
-    resp = jira_request("GET", f"/rest/agile/1.0/sprint/{sprint_id}/issue?maxResults=500&expand=subtasks")
-    if resp.status_code != 200:
-        print(f"Failed to fetch sprint issues: {resp.status_code} {resp.text}")
-        return []
-
-    issues = resp.json().get("issues", [])
+    # Stream all issues in the sprint, page by page
+    wanted_types = [t.lower() for t in include_types]
     result = []
-    for issue in issues:
+    # Filter types here: a server-side "issuetype in" gets a 400 when a type does not exist
+    for issue in iter_sprint_issues(sprint_id, fields="summary,issuetype,status,subtasks", prefetch=True):
         fields = issue.get("fields", {})
         issue_type = fields.get("issuetype", {}).get("name", "")
-        if issue_type.lower() in [t.lower() for t in include_types]:
+        if issue_type.lower() in wanted_types:
             result.append({
                 "key": issue["key"],
                 "summary": fields.get("summary", ""),
@@ -38,59 +41,134 @@ def get_sprint_issues(sprint_id, include_types=None):
             })
 
     print(f"Found {len(result)} {', '.join(include_types)} issues in sprint {sprint_id}.")
-    for r in result:
-        print(f" - {r['key']} [{r['type']}] {r['summary']} ({r['status']})")
+    if verbose:
+        for r in result:
+            print(f" - {r['key']} [{r['type']}] {r['summary']} ({r['status']})")
     return result
 
 
-def ensure_subtasks_for_issue(issue_key, subtasks=None):
+def parent_subtasks(issue_key):
+    """(issue type, subtasks) of a parent from the mirror or one GET, or None if the lookup failed."""
+    mirror = mirror_for(project_of(issue_key))
+    subtasks = mirror.subtasks(issue_key) if mirror else None
+    if subtasks is not None:
+        return mirror.issue_type(issue_key), subtasks
+    resp = jira_request("GET", f"issue/{issue_key}?fields=subtasks,issuetype,summary")
+    if resp.status_code != 200:
+        print(f"  ❌ Failed to fetch subtasks for {issue_key}: {resp.status_code}")
+        return None
+    fields = resp.json().get("fields", {})
+    return (fields.get("issuetype") or {}).get("name", ""), fields.get("subtasks", [])
+
+
+def plan_subtasks(issues, fix_drift=False):
     """
-    Ensure the given issue has required subtasks.
-    Optionally pass existing subtasks (to skip extra GET calls).
+    Diff every parent against its project/type template, using the subtasks
+    already fetched with the issues (no requests). issues are get_sprint_issues()
+    records; a parent listed twice is planned once. See reconcile_subtasks for fix_drift.
+    Returns ({parent key: [missing names]}, {parent key: [(sub-task key, summary, template name)]}).
     """
-    print(f"\nChecking subtasks for {issue_key}...")
+    missing_by_issue, drift_by_issue = {}, {}
+    for issue in issues:
+        if issue["key"] in missing_by_issue:
+            continue
+        template = template_for(project_of(issue["key"]), issue.get("type"))
+        missing_by_issue[issue["key"]], drift_by_issue[issue["key"]] = \
+            reconcile_subtasks(issue.get("subtasks", []), template, fix_drift)
+    return ({k: names for k, names in missing_by_issue.items() if names},
+            {k: drifted for k, drifted in drift_by_issue.items() if drifted})
 
-    existing_subs = []
-    if subtasks is not None:
-        existing_subs = [s["fields"]["summary"].strip().lower() for s in subtasks]
-    else:
-        # Fetch subtasks if not provided
-        resp = jira_request("GET", f"issue/{issue_key}?fields=subtasks,issuetype,summary")
-        if resp.status_code != 200:
-            print(f"  ❌ Failed to fetch subtasks for {issue_key}: {resp.status_code}")
-            return
-        fields = resp.json().get("fields", {})
-        existing_subs = [s["fields"]["summary"].strip().lower() for s in fields.get("subtasks", [])]
 
-    for sub_name in REQUIRED_SUBTASKS:
-        if sub_name.lower() in existing_subs:
-            print(f"  ✅ Sub-task '{sub_name}' already exists.")
-            continue
+def fix_subtask_drift(drift_by_issue, workers=SUBTASK_FIX_WORKERS):
+    """Rename drifted sub-tasks to their template names, up to `workers` PUTs at a time. Returns the fixed keys."""
+    renames = [(key, name) for drifted in drift_by_issue.values() for key, _, name in drifted]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(lambda r: update_fields(r[0], {"summary": r[1]}), renames))
+    return {key for (key, _), ok in zip(renames, results) if ok}
+
+
+def print_drift(drift_by_issue, fix_drift):
+    total = sum(len(d) for d in drift_by_issue.values())
+    if not total:
+        return
+    print(f"\n⚠️ {total} sub-tasks differ from their template name"
+          + ("; renaming them..." if fix_drift else " (add --fix-drift to rename them):"))
+    if not fix_drift:
+        for parent, drifted in drift_by_issue.items():
+            for key, summary, name in drifted:
+                print(f"   - {parent}: {key} '{summary}' → '{name}'")
+
+
+def subtask_fields(issue_key, sub_name):
+    return build_issue_fields(
+        issue_key.split("-")[0],
+        sub_name,
+        "Sub Task",
+        description=f"Auto-created sub-task '{sub_name}' for {issue_key}",
+        parent_key=issue_key,
+    )
+
+
+def create_subtasks(missing_by_issue):
+    """
+    Create all missing sub-tasks through the bulk endpoint.
+    missing_by_issue maps parent key -> list of sub-task names.
+    Returns {parent key: [(name, new key or None), ...]}.
+    """
+    return _assign_keys(missing_by_issue, create_issues_bulk(_subtask_items(missing_by_issue)))
+
+
+def _subtask_items(missing_by_issue):
+    return [
+        {"fields": subtask_fields(issue_key, sub_name), "linked": issue_key}
+        for issue_key, names in missing_by_issue.items()
+        for sub_name in names
+    ]
+
+
+def _assign_keys(missing_by_issue, keys):
+    keys = iter(keys)
+    return {
+        issue_key: [(sub_name, next(keys)) for sub_name in names]
+        for issue_key, names in missing_by_issue.items()
+    }
+
 
-        payload = {
-            "fields": {
-                "project": {"key": issue_key.split("-")[0]},
-                "parent": {"key": issue_key},
-                "summary": sub_name,
-                "issuetype": {"name": "Sub Task"},
-                "description": f"Auto-created sub-task '{sub_name}' for {issue_key}"
-            }
-        }
-
-        resp = jira_request("POST", "issue", json=payload)
-        if resp.status_code == 201:
-            sub_key = resp.json()["key"]
-            print(f"  ➕ Created sub-task: {sub_key} ({sub_name})")
-        else:
-            print(f"  ❌ Failed to create sub-task '{sub_name}': {resp.status_code} {resp.text[:200]}")
+def ensure_subtasks_for_issue(issue_key, subtasks=None, issue_type=None, fix_drift=False):
+    """
+    Ensure the given issue has the sub-tasks of its template.
+    Optionally pass existing subtasks and the issue type (to skip extra GET calls).
+    fix_drift=True renames sub-tasks whose summary only loosely matches the template.
+    """
+    print(f"\nChecking subtasks for {issue_key}...")
+
+    if subtasks is None:
+        found = parent_subtasks(issue_key)
+        if found is None:
+            return
+        issue_type, subtasks = found
+    missing_by_issue, drift_by_issue = plan_subtasks(
+        [{"key": issue_key, "type": issue_type, "subtasks": subtasks}], fix_drift)
+    missing = missing_by_issue.get(issue_key, [])
+    for sub_name in template_for(project_of(issue_key), issue_type):
+        if sub_name not in missing:
+            print(f"  ✅ Sub-task '{sub_name}' already exists on {issue_key}.")
+    if missing:
+        create_subtasks(missing_by_issue)
+    print_drift(drift_by_issue, fix_drift)
+    if fix_drift:
+        fix_subtask_drift(drift_by_issue)
 
     print(f"✅ Finished ensuring subtasks for {issue_key}")
 
 
-def ensure_subtasks_for_sprint(sprint_id):
+@instrumented("Sprint sub-tasks")
+def ensure_subtasks_for_sprint(sprint_id, fix_drift=False):
     """
-    For each Story, Task, or Bug in the given sprint,
-    ensure required subtasks (Implement, Review, Test) exist.
+    For each Story, Task, or Bug in the given sprint, ensure the sub-tasks of
+    its template exist (REQUIRED_SUBTASKS unless templates are configured).
+    All missing sub-tasks of the sprint are created in bulk requests.
+    fix_drift=True also renames sub-tasks that drifted from their template name.
     """
     issues = get_sprint_issues(sprint_id)
     if not issues:
@@ -99,7 +177,124 @@ def ensure_subtasks_for_sprint(sprint_id):
 
     print(f"\n🧩 Processing {len(issues)} issues from sprint {sprint_id}...\n")
 
-    for issue in issues:
-        ensure_subtasks_for_issue(issue["key"], subtasks=issue.get("subtasks", []))
+    missing_by_issue, drift_by_issue = plan_subtasks(issues, fix_drift)
+    total = sum(len(names) for names in missing_by_issue.values())
+    print(f"\n➕ Creating {total} missing sub-tasks for {len(missing_by_issue)} issues...")
+    results = create_subtasks(missing_by_issue)
+    failed = [(k, name) for k, created in results.items() for name, key in created if not key]
+    if failed:
+        print(f"❌ {len(failed)} sub-tasks could not be created:")
+        for issue_key, sub_name in failed:
+            print(f"   - {issue_key}: {sub_name}")
+    print_drift(drift_by_issue, fix_drift)
+    if fix_drift:
+        fixed = fix_subtask_drift(drift_by_issue)
+        print(f"✏️  Renamed {len(fixed)} sub-tasks.")
 
     print("\n✅ Sub-task creation completed for all issues in sprint.\n")
+
+
+# ------------------------------------------------------------
+# Many sprints at once
+# ------------------------------------------------------------
+SPRINT_CONCURRENCY = 8  # sprint fetches / bulk creates in flight at once
+
+
+async def _run_bounded(calls, concurrency):
+    """Run blocking (fn, *args) calls in worker threads, at most `concurrency` at a time. Keeps order."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(fn, *args):
+        async with semaphore:
+            return await asyncio.to_thread(fn, *args)
+
+    return await asyncio.gather(*(run(*call) for call in calls))
+
+
+async def _reconcile_sprints(sprint_ids, concurrency, fix_drift=False):
+    issues_by_sprint = await _run_bounded(
+        [(get_sprint_issues, sprint_id, None, False) for sprint_id in sprint_ids], concurrency)
+
+    # An issue carried over between sprints is checked (and reported) once, under its first sprint
+    report = {}
+    missing_by_issue, drift_by_issue, seen = {}, {}, set()
+    for sprint_id, issues in zip(sprint_ids, issues_by_sprint):
+        missing, drift = plan_subtasks([issue for issue in issues if issue["key"] not in seen], fix_drift)
+        seen.update(issue["key"] for issue in issues)
+        report[sprint_id] = {"issues": len(issues), "parents": list(missing),
+                             "missing": sum(len(names) for names in missing.values()), "created": 0, "failed": [],
+                             "drifted": [key for drifted in drift.values() for key, _, _ in drifted], "renamed": 0}
+        missing_by_issue.update(missing)
+        drift_by_issue.update(drift)
+
+    items = _subtask_items(missing_by_issue)
+    print(f"\n➕ Creating {len(items)} missing sub-tasks for {len(missing_by_issue)} issues "
+          f"across {len(sprint_ids)} sprints...")
+    batches = [items[i:i + BULK_CREATE_SIZE] for i in range(0, len(items), BULK_CREATE_SIZE)]
+    keys = [key for batch_keys in await _run_bounded([(create_issues_bulk, b) for b in batches], concurrency)
+            for key in batch_keys]
+    results = _assign_keys(missing_by_issue, keys)
+
+    for entry in report.values():
+        for issue_key in entry["parents"]:
+            for sub_name, key in results[issue_key]:
+                if key:
+                    entry["created"] += 1
+                else:
+                    entry["failed"].append((issue_key, sub_name))
+
+    print_drift(drift_by_issue, fix_drift)
+    if fix_drift:
+        fixed = await asyncio.to_thread(fix_subtask_drift, drift_by_issue, concurrency)
+        for entry in report.values():
+            entry["renamed"] = sum(1 for key in entry["drifted"] if key in fixed)
+    return report
+
+
+def print_sprint_report(report):
+    print("\n📋 Sub-task report")
+    print(f"   {'Sprint':<10} {'Issues':>7} {'Missing':>8} {'Created':>8} {'Failed':>7} {'Drift':>6} {'Renamed':>8}")
+    for sprint_id, entry in report.items():
+        print(f"   {str(sprint_id):<10} {entry['issues']:>7} {entry['missing']:>8} "
+              f"{entry['created']:>8} {len(entry['failed']):>7} {len(entry['drifted']):>6} {entry['renamed']:>8}")
+    print(f"   {'Total':<10} {sum(e['issues'] for e in report.values()):>7} "
+          f"{sum(e['missing'] for e in report.values()):>8} "
+          f"{sum(e['created'] for e in report.values()):>8} "
+          f"{sum(len(e['failed']) for e in report.values()):>7} "
+          f"{sum(len(e['drifted']) for e in report.values()):>6} "
+          f"{sum(e['renamed'] for e in report.values()):>8}")
+
+    failed = [(sprint_id, f) for sprint_id, e in report.items() for f in e["failed"]]
+    if failed:
+        print(f"\n❌ {len(failed)} sub-tasks could not be created:")
+        for sprint_id, (issue_key, sub_name) in failed:
+            print(f"   - sprint {sprint_id}, {issue_key}: {sub_name}")
+
+
+@instrumented("Multi-sprint sub-tasks")
+def ensure_subtasks_for_sprints(sprint_ids, concurrency=SPRINT_CONCURRENCY, fix_drift=False):
+    """
+    ensure_subtasks_for_sprint for many sprints in one run: all sprints are fetched
+    concurrently, the missing sub-tasks are created through bulk requests with at most
+    `concurrency` in flight, and one consolidated report is printed at the end.
+    fix_drift=True also renames drifted sub-tasks, `concurrency` PUTs at a time.
+    """
+    sprint_ids = list(dict.fromkeys(str(s) for s in sprint_ids))
+    if not sprint_ids:
+        print("No sprints to process.")
+        return {}
+
+    print(f"🧩 Processing {len(sprint_ids)} sprints ({concurrency} at a time)...\n")
+    report = asyncio.run(_reconcile_sprints(sprint_ids, concurrency, fix_drift))
+    print_sprint_report(report)
+    print("\n✅ Sub-task creation completed for all sprints.\n")
+    return report
+
+
+def get_board_sprint_ids(board_id, state="active"):
+    """IDs of the board's sprints in the given state(s), e.g. "active" or "active,future"."""
+    sprints = list(iter_board_sprints(board_id, state))
+    print(f"Found {len(sprints)} {state} sprints on board {board_id}.")
+    for sprint in sprints:
+        print(f" - {sprint['id']} {sprint.get('name', '')}")
+    return [sprint["id"] for sprint in sprints]
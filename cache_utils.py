@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import JIRA_URL, JIRA_CACHE_DIR, JIRA_CACHE_TTL
+
+_lock = threading.Lock()
+_entries = None  # loaded lazily on first access
+
+
+def cache_path():
+    """One JSON file per Jira instance, so several servers never share entries."""
+    digest = hashlib.sha1(JIRA_URL.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(JIRA_CACHE_DIR, f"metadata_{digest}.json")
+
+
+def _load():
+    global _entries
+    if _entries is None:
+        try:
+            with open(cache_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            _entries = data.get("entries", {}) if data.get("jira_url") == JIRA_URL else {}
+        except (OSError, ValueError):
+            _entries = {}
+    return _entries
+
+
+def _save():
+    path = cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"jira_url": JIRA_URL, "entries": _entries}, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Could not write metadata cache {path}: {e}")
+
+
+def cached(name, loader, ttl=None):
+    """
+    Return the cached value for name, calling loader() when it is missing or
+    older than ttl seconds (JIRA_CACHE_TTL by default). A loader result of None
+    means the lookup failed and is not cached.
+    """
+    ttl = JIRA_CACHE_TTL if ttl is None else ttl
+    with _lock:
+        entry = _load().get(name)
+        if entry and time.time() - entry["fetched_at"] < ttl:
+            return entry["value"]
+
+    value = loader()
+    if value is not None:
+        with _lock:
+            _load()[name] = {"value": value, "fetched_at": time.time()}
+            _save()
+    return value
+
+
+def invalidate(name=None):
+    """Drop one cached entry, or everything cached for this Jira instance."""
+    global _entries
+    with _lock:
+        if name is None:
+            _entries = {}
+        else:
+            _load().pop(name, None)
+        _save()
@@ -4,6 +4,37 @@ import sys
 JIRA_URL = os.getenv("JIRA_URL", "").strip().strip('"').strip("'").rstrip("/")
 JIRA_TOKEN = os.getenv("JIRA_TOKEN", "").strip()
 
-if not JIRA_URL or not JIRA_TOKEN:
-    print("Missing JIRA_URL or JIRA_TOKEN environment variables.")
-    sys.exit(1)
+
+def require_credentials():
+    """Exit with a message when JIRA_URL / JIRA_TOKEN are missing (checked before the first request)."""
+    if not JIRA_URL or not JIRA_TOKEN:
+        print("Missing JIRA_URL or JIRA_TOKEN environment variables.")
+        sys.exit(1)
+
+
+# HTTP connection pool and retry tuning
+JIRA_POOL_SIZE = int(os.getenv("JIRA_POOL_SIZE", "20"))
+JIRA_MAX_RETRIES = int(os.getenv("JIRA_MAX_RETRIES", "5"))
+JIRA_BACKOFF = float(os.getenv("JIRA_BACKOFF", "0.5"))
+JIRA_TIMEOUT = float(os.getenv("JIRA_TIMEOUT", "60"))
+
+# Local metadata cache (field IDs, issue types, link types)
+JIRA_CACHE_DIR = os.path.expanduser(os.getenv("JIRA_CACHE_DIR", "~/.cache/jira-epic-story-sync"))
+JIRA_CACHE_TTL = int(os.getenv("JIRA_CACHE_TTL", str(24 * 3600)))
+
+# Local SQLite mirror of synced projects, refreshed with "updated >=" delta queries
+JIRA_MIRROR = os.getenv("JIRA_MIRROR", "").strip().lower() in ("1", "true", "yes")
+
+# Client-side throttling shared by every command (0: no fixed limit, only adapt to 429s)
+JIRA_RATE_LIMIT = float(os.getenv("JIRA_RATE_LIMIT", "0"))
+JIRA_RATE_BURST = int(os.getenv("JIRA_RATE_BURST", "20"))
+JIRA_MAX_CONCURRENCY = int(os.getenv("JIRA_MAX_CONCURRENCY", str(JIRA_POOL_SIZE)))
+
+# JSON file with per-project / per-issue-type sub-task templates (empty = built-in list)
+JIRA_SUBTASK_TEMPLATES = os.path.expanduser(os.getenv("JIRA_SUBTASK_TEMPLATES", "").strip())
+
+# Sync log format: "csv" or "jsonl" (JSON Lines)
+JIRA_LOG_FORMAT = os.getenv("JIRA_LOG_FORMAT", "csv").strip().lower()
+
+# Per-run performance report export (.json or .prom); empty disables the export
+JIRA_METRICS_FILE = os.getenv("JIRA_METRICS_FILE", "").strip()
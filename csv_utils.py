@@ -1,160 +1,277 @@
+import codecs
 import csv
+import io
 import sys
-from datetime import datetime
+from collections import Counter
+from contextlib import ExitStack, contextmanager
 
 from issue_utils import (
     find_issue_by_summary,
-    create_issue,
     get_epic_link_field,
-    get_current_epic_link,
-    update_epic_link,
+    get_project_index,
+    normalize_summary,
+    prefetch_issue_fields,
 )
 
-from link_utils import (
-    is_already_linked,
-    create_issue_link,
-)
+from jira_api import IncompleteResultsError
+from journal_utils import SyncJournal, journal_path, row_hash
+from log_utils import SyncLog, log_filename
+from metrics_utils import instrumented
+from plan_utils import build_plan, execute_plan, plan_counts, print_plan_changes, print_plan_counts
 
 # ------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------
-def now():
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+CSV_CHUNK_SIZE = 5000     # rows planned and executed together
+SNIFF_BYTES = 64 * 1024  # read once to detect encoding and delimiter
+SNIFF_DELIMITERS = "\t,;|"
+
+
+def detect_encoding(sample):
+    """Encoding of a CSV from its first bytes: BOM if present, else UTF-8, else cp1252."""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # Incremental decode: the sample may end in the middle of a character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def detect_delimiter(sample_text):
+    """Detect the CSV delimiter from the first lines (tab, comma, semicolon or pipe)."""
+    try:
+        return csv.Sniffer().sniff(sample_text, delimiters=SNIFF_DELIMITERS).delimiter
+    except csv.Error:
+        header = sample_text.splitlines()[0] if sample_text else ""
+        return "\t" if "\t" in header else ","
+
+
+class _Cp1252Fallback:
+    """
+    Decode error handler for one open CSV: reads bytes that are invalid in the
+    sniffed encoding as cp1252 and counts them. Registered under a name of its
+    own, so files decoded at the same time keep separate counts.
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.name = f"csv_cp1252_fallback_{id(self)}"
+        codecs.register_error(self.name, self)
+
+    def __call__(self, error):
+        if not isinstance(error, UnicodeDecodeError):
+            raise error
+        self.bytes += error.end - error.start
+        return error.object[error.start:error.end].decode("cp1252", errors="replace"), error.end
+
+
+@contextmanager
+def open_csv(path):
+    """
+    Open the CSV once and yield a DictReader over it. Encoding and delimiter
+    are sniffed from the first SNIFF_BYTES; bytes further down that do not fit
+    the encoding are read as cp1252 with a warning. Header names are cleaned
+    of BOMs and surrounding spaces.
+    """
+    with open(path, "rb") as raw:
+        sample = raw.read(SNIFF_BYTES)
+        raw.seek(0)
+        encoding = detect_encoding(sample)
+        sample_text = sample.decode(encoding, errors="replace")
+        # Drop a possibly cut-off last line before sniffing
+        lines = sample_text.splitlines()
+        sample_text = "\n".join(lines[:-1] if len(lines) > 1 else lines)
+
+        fallback = _Cp1252Fallback()
+        try:
+            with io.TextIOWrapper(raw, encoding=encoding, errors=fallback.name, newline="") as text:
+                reader = csv.DictReader(text, delimiter=detect_delimiter(sample_text))
+                if reader.fieldnames:
+                    reader.fieldnames = [h.strip().replace("\ufeff", "") for h in reader.fieldnames]
+                yield reader
+        finally:
+            if fallback.bytes:
+                print(f"⚠️ {path}: {fallback.bytes} bytes were not valid {encoding} and were read as cp1252.")
+
+
+def row_values(row):
+    """Extract the stripped CSV fields the sync works with."""
+    return {
+        "epic": (row.get("Epic") or "").strip(),
+        "epic_description": (row.get("Epic_Summary(customfield_10004)") or "").strip(),
+        "epic_upper_link": (row.get("Epic_Upper_Link") or "").strip().upper(),
+        "story": (row.get("Story") or "").strip(),
+        "story_description": (row.get("Story_Description(description)") or "").strip(),
+        "story_upper_link": (row.get("Story_Upper_Link") or "").strip().upper(),
+        "task": (row.get("RE_Task", row.get("RE Task")) or "").strip(),
+    }
+
 
+def iter_row_chunks(reader, skip, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Stream normalized rows in chunks of up to chunk_size rows. Yields
+    (rows, carried, duplicates): rows are (row_no, values, hash) to sync,
+    carried are hashes in `skip` (already synced), and duplicates counts rows
+    identical to an earlier row of the same chunk, which collapse into it.
+    """
+    rows, carried, seen, duplicates = [], [], set(), 0
+    for row_no, row in enumerate(reader):
+        values = row_values(row)
+        h = row_hash(values)
+        if h in skip:
+            carried.append(h)
+        elif h in seen:
+            duplicates += 1
+        else:
+            seen.add(h)
+            rows.append((row_no, values, h))
+        if row_no % chunk_size == chunk_size - 1:
+            yield rows, carried, duplicates
+            rows, carried, seen, duplicates = [], [], set(), 0
+    if rows or carried or duplicates:
+        yield rows, carried, duplicates
 
-def detect_delimiter(path):
-    """Detect CSV delimiter (tab or comma)."""
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        line = f.readline()
-        return "\t" if "\t" in line else ","
+
+def prefetch_rows(rows, project_key, index, epic_link_field):
+    """
+    Fetch the Epic link / issuelinks of every existing issue the rows touch and
+    of every upper-link target, in batched "key in (...)" queries. This also
+    validates the targets. Repeated Epics/Stories/targets are looked up once.
+    """
+    summaries = {(t, values[t.lower()]) for _, values, _ in rows for t in ("Epic", "Story", "Task")}
+    touched = {values[f] for _, values, _ in rows for f in ("epic_upper_link", "story_upper_link") if values[f]}
+    for issue_type, summary in summaries:
+        issue = find_issue_by_summary(summary, project_key, index, issue_type)
+        if issue:
+            touched.add(issue["key"])
+    return prefetch_issue_fields(touched, epic_link_field)
+
+
+def drop_planned(plan, planned):
+    """
+    Dry run across chunks: nothing is created between chunks, so a later chunk
+    would plan the same creates, epic-link updates and links again. Mark those
+    as already planned (`planned` collects the ids across chunks).
+    """
+    for n in plan["nodes"]:
+        if n["action"] in ("create", "update_epic"):
+            op_id = (n["action"], n["type"], normalize_summary(n["summary"]))
+            if op_id in planned:
+                n["action"] = "planned"
+            planned.add(op_id)
+    for l in plan["links"]:
+        if not l["exists"] and not l["invalid"]:
+            op_id = ("link", l["source"]["type"], normalize_summary(l["source"]["summary"]), l["target"], l["type"])
+            if op_id in planned:
+                l["exists"] = True
+            planned.add(op_id)
 
 
 # ------------------------------------------------------------
 # Main CSV processing
 # ------------------------------------------------------------
-def process_csv(project_key, csv_path):
-    epic_link_field = get_epic_link_field()
-    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_filename = f"jira_log_{timestamp_str}.csv"
+@instrumented("CSV sync")
+def process_csv(project_key, csv_path, workers=1, mode=None, dry_run=False, chunk_size=CSV_CHUNK_SIZE):
+    """Sync one CSV into the project (see sync_csv) and print the performance report."""
+    return sync_csv(project_key, csv_path, workers, mode, dry_run, chunk_size)
+
 
-    epic_cache = {}
-    delimiter = detect_delimiter(csv_path)
+def sync_csv(project_key, csv_path, workers=1, mode=None, dry_run=False, chunk_size=CSV_CHUNK_SIZE, writer=None):
+    """
+    Sync the CSV into Jira in two stages per chunk of chunk_size rows: build a
+    plan of every create, epic-link update and link from the rows and the project
+    index, then execute it with bulk creates and `workers` parallel requests.
+    Created issues go into the index, so later chunks reuse them. The file is
+    streamed, so memory stays bounded for very large CSVs.
+    dry_run prints the planned changes and stops before executing anything.
 
-    with open(csv_path, newline="", encoding="utf-8", errors="ignore") as csvfile, \
-         open(log_filename, "w", newline="", encoding="utf-8") as logfile:
+    mode selects rows from the checkpoint journal: None runs every row,
+    "resume" skips rows an interrupted run already finished,
+    "changed" skips rows unchanged since the last complete sync.
 
-        reader = csv.DictReader(csvfile, delimiter=delimiter)
+    writer sends the log to an existing csv.writer-like object instead of a
+    new jira_log_<timestamp>.csv/.jsonl (see log_utils.SyncLog). Returns the summed plan counts.
+    """
+    totals = Counter()
+    carried_total = duplicates_total = 0
+    planned = set()  # dry run: operations already counted in an earlier chunk
+
+    with ExitStack() as stack:
+        # Check the file before the (expensive) project index is loaded
+        try:
+            reader = stack.enter_context(open_csv(csv_path))
+        except OSError as e:
+            print(f"❌ Cannot read {csv_path}: {e.strerror or e}")
+            sys.exit(1)
         if not reader.fieldnames:
             print(f"Error: No header found in {csv_path}")
             sys.exit(1)
 
-        # Clean BOM / spaces
-        reader.fieldnames = [h.strip().replace("\ufeff", "") for h in reader.fieldnames]
-
-        writer = csv.writer(logfile)
-        writer.writerow(["Timestamp", "Action", "Issue Key", "Type", "Linked Epic", "Message"])
-
-        for row in reader:
-            timestamp = now()
-
-            epic_summary = row.get("Epic", "").strip()
-            epic_description = row.get("Epic_Summary(customfield_10004)", "").strip()
-            epic_upper_link = row.get("Epic_Upper_Link", "").strip()
+        epic_link_field = get_epic_link_field()
+        try:
+            index = get_project_index(project_key, epic_link_field)
+        except IncompleteResultsError as e:
+            # Issues on the missing pages would be planned as creates and duplicated
+            print(f"❌ Could not load the issues of {project_key}: {e}")
+            print("   Nothing was synced.")
+            sys.exit(1)
 
-            story_summary = row.get("Story", "").strip()
-            story_description = row.get("Story_Description(description)", "").strip()
-            story_upper_link = row.get("Story_Upper_Link", "").strip()
+        journal = SyncJournal(journal_path(project_key, csv_path))
+        skip = journal.skip_set(mode)
+        if mode == "resume" and not skip:
+            print("No interrupted sync to resume, processing all rows.")
 
-            task_summary = row.get("RE_Task", row.get("RE Task", "")).strip()
+        log_path = None
+        if not dry_run:
+            journal.start()
+            if writer is None:
+                log_path = log_filename()
+                writer = stack.enter_context(SyncLog(log_path))
 
-            if not (epic_summary and story_summary and task_summary):
-                msg = f"Incomplete row: {row}"
-                print(msg)
-                writer.writerow([timestamp, "Skipped", "", "Row", "", msg])
+        for chunk_no, (rows, carried, duplicates) in enumerate(iter_row_chunks(reader, skip, chunk_size), 1):
+            carried_total += len(carried)
+            duplicates_total += duplicates
+            if not dry_run:
+                for h in carried:
+                    # Already synced and unchanged: carry it over into this run's checkpoint
+                    journal.record(h, skip[h])
+            if not rows:
                 continue
 
-            # ------------------------------------------------
-            # EPIC
-            # ------------------------------------------------
-            epic_key = epic_cache.get(epic_summary)
-            if not epic_key:
-                epic_issue = find_issue_by_summary(epic_summary, project_key)
-                if isinstance(epic_issue, dict):
-                    epic_key = epic_issue["key"]
-                    writer.writerow([timestamp, "No Change", epic_key, "Epic", "", ""])
-                else:
-                    epic_key = create_issue(
-                        project_key,
-                        epic_summary,
-                        "Epic",
-                        description=epic_description,
-                        epic_name=epic_summary,
-                        writer=writer,
-                    )
-
-                if epic_key:
-                    epic_cache[epic_summary] = epic_key
-
-            if not epic_key:
-                continue
+            fetched = prefetch_rows(rows, project_key, index, epic_link_field)
+            plan = build_plan(project_key, rows, index, epic_link_field)
+            print(f"\n📦 Chunk {chunk_no}: {len(rows)} rows"
+                  + (f", {duplicates} duplicate rows collapsed" if duplicates else "")
+                  + (f", prefetched fields of {fetched} issues" if fetched else ""))
 
-            # Epic upper link
-            if epic_upper_link:
-                if not is_already_linked(epic_key, epic_upper_link, "Needs"):
-                    create_issue_link(epic_key, epic_upper_link, "Needs", writer)
-                else:
-                    writer.writerow([timestamp, "Link Exists", epic_key, "Link", epic_upper_link, "Already linked"])
-
-            # ------------------------------------------------
-            # STORY
-            # ------------------------------------------------
-            story_issue = find_issue_by_summary(story_summary, project_key)
-            if isinstance(story_issue, dict):
-                story_key = story_issue["key"]
-                current_epic = get_current_epic_link(story_key, epic_link_field)
-                if current_epic != epic_key:
-                    update_epic_link(story_key, epic_key, epic_link_field, writer)
-                else:
-                    writer.writerow([timestamp, "No Change", story_key, "Story", epic_key, ""])
+            if dry_run:
+                drop_planned(plan, planned)
+                print_plan_changes(plan)
             else:
-                story_key = create_issue(
-                    project_key,
-                    story_summary,
-                    "Story",
-                    epic_key=epic_key,
-                    epic_link_field=epic_link_field,
-                    description=story_description,
-                    writer=writer,
-                )
-
-            if not story_key:
-                continue
+                def row_done(row_no, ok, keys, plan=plan):
+                    if ok:
+                        journal.record(plan["rows"][row_no]["hash"], keys)
 
-            if story_upper_link:
-                if not is_already_linked(story_key, story_upper_link, "Needs"):
-                    create_issue_link(story_key, story_upper_link, "Needs", writer)
-                else:
-                    writer.writerow([timestamp, "Link Exists", story_key, "Link", story_upper_link, "Already linked"])
-
-            # ------------------------------------------------
-            # TASK
-            # ------------------------------------------------
-            task_issue = find_issue_by_summary(task_summary, project_key)
-            if isinstance(task_issue, dict):
-                task_key = task_issue["key"]
-                current_epic = get_current_epic_link(task_key, epic_link_field)
-                if current_epic != epic_key:
-                    update_epic_link(task_key, epic_key, epic_link_field, writer)
-                else:
-                    writer.writerow([timestamp, "No Change", task_key, "Task", epic_key, ""])
-            else:
-                task_key = create_issue(
-                    project_key,
-                    task_summary,
-                    "Task",
-                    epic_key=epic_key,
-                    epic_link_field=epic_link_field,
-                    writer=writer,
-                )
-
-    print(f"\nLog saved to {log_filename}")
+                execute_plan(plan, project_key, epic_link_field, index, writer, workers, on_row_done=row_done)
+            totals.update(plan_counts(plan))
+
+    if mode:
+        print(f"\nJournal: skipped {carried_total} rows already synced.")
+    if duplicates_total:
+        print(f"Collapsed {duplicates_total} duplicate rows.")
+    for key in ("rows", "incomplete", "create_epic", "create_story", "create_task",
+                "update_epic_link", "add_link", "invalid_link", "no_change", "link_exists", "api_calls"):
+        totals.setdefault(key, 0)
+    print_plan_counts(totals, "Sync plan" if dry_run else "Sync summary")
+    if dry_run:
+        print("\nDry run: no changes were made.")
+        return dict(totals)
+
+    journal.finish()
+    if log_path:
+        print(f"\nLog saved to {log_path}")
+    return dict(totals)
@@ -1,17 +1,169 @@
-from datetime import datetime
-from jira_api import jira_request, get_epic_link_field
+import re
+import threading
+from jira_api import jira_request, get_epic_link_field, search_issues
+from log_utils import log_row
+from mirror_utils import get_mirror, mirror_for
 
-def find_issue_by_summary(summary, project_key):
-    jql = f'project = "{project_key}" AND summary ~ "{summary}"'
-    resp = jira_request("GET", f"search?jql={jql}")
-    if resp.status_code == 200:
+INDEX_ISSUE_TYPES = ["Epic", "Story", "Task"]
+INDEX_PAGE_SIZE = 1000
+BULK_CREATE_SIZE = 50  # Jira's limit for POST issue/bulk
+PREFETCH_BATCH_SIZE = 100  # keys per "key in (...)" query
+ISSUE_KEY_PATTERN = re.compile(r"[A-Z][A-Z0-9_]*-[1-9][0-9]*")
+
+# Run-wide memo of the epic link and issuelinks of each issue touched so far.
+# Filled by the project index / prefetch_issue_fields() and updated after every
+# successful write, so repeated checks on the same issue never hit Jira again.
+_issue_fields = {}
+_issue_fields_lock = threading.Lock()
+_missing_issues = set()  # well-formed keys a prefetch asked for and Jira did not return
+
+# Project indexes built in this process, shared by every sync of the same project
+_project_indexes = {}
+_project_index_locks = {}
+_project_indexes_lock = threading.Lock()
+
+def normalize_summary(summary):
+    return (summary or "").strip().lower()
+
+def build_project_index(project_key, epic_link_field, issue_types=None):
+    """
+    Load every Epic/Story/Task of the project once and index it by normalized summary.
+    Each entry is a list of {"key", "summary", "type", "epic_link", "issuelinks"} records.
+    """
+    issue_types = issue_types or INDEX_ISSUE_TYPES
+    mirror = mirror_for(project_key, epic_link_field)
+
+    print(f"Loading {', '.join(issue_types)} index for project {project_key}...")
+    index = {}
+    count = 0
+    records = mirror.records(project_key, issue_types) if mirror else \
+        _search_index_records(project_key, epic_link_field, issue_types)
+    for record in records:
+        add_to_index(index, record["key"], record["summary"], record["type"],
+                     epic_link=record["epic_link"], issuelinks=record["issuelinks"])
+        remember_issue_fields(record["key"], record["epic_link"], record["issuelinks"])
+        count += 1
+
+    print(f"Indexed {count} issues ({len(index)} distinct summaries).")
+    return index
+
+def _search_index_records(project_key, epic_link_field, issue_types):
+    type_list = ", ".join(f'"{t}"' for t in issue_types)
+    jql = f'project = "{project_key}" AND issuetype in ({type_list}) ORDER BY key ASC'
+    wanted_fields = f"summary,issuetype,issuelinks,{epic_link_field}"
+    for issue in search_issues(jql, wanted_fields, page_size=INDEX_PAGE_SIZE, prefetch=True):
+        fields = issue.get("fields", {})
+        yield {
+            "key": issue["key"],
+            "summary": fields.get("summary", ""),
+            "type": (fields.get("issuetype") or {}).get("name", ""),
+            "epic_link": fields.get(epic_link_field),
+            "issuelinks": fields.get("issuelinks", []),
+        }
+
+def get_project_index(project_key, epic_link_field):
+    """Return the project's index, building it on first use (once per process)."""
+    with _project_indexes_lock:
+        lock = _project_index_locks.setdefault(project_key, threading.Lock())
+    with lock:
+        if project_key not in _project_indexes:
+            _project_indexes[project_key] = build_project_index(project_key, epic_link_field)
+        return _project_indexes[project_key]
+
+def add_to_index(index, key, summary, issue_type, epic_link=None, issuelinks=None):
+    record = {
+        "key": key,
+        "summary": summary,
+        "type": issue_type,
+        "epic_link": epic_link,
+        "issuelinks": issuelinks or [],
+    }
+    index.setdefault(normalize_summary(summary), []).append(record)
+    return record
+
+def remember_issue_fields(issue_key, epic_link, issuelinks):
+    with _issue_fields_lock:
+        _issue_fields[issue_key] = {"epic_link": epic_link, "issuelinks": list(issuelinks or [])}
+
+def cached_issue_fields(issue_key):
+    """Return the memoized {"epic_link", "issuelinks"} of an issue, or None."""
+    with _issue_fields_lock:
+        return _issue_fields.get(issue_key)
+
+def update_cached_issue_fields(issue_key, epic_link=None, add_link=None):
+    """Apply a successful write to the memo (no-op for issues that were never loaded)."""
+    with _issue_fields_lock:
+        entry = _issue_fields.get(issue_key)
+        if entry is None:
+            return
+        if epic_link is not None:
+            entry["epic_link"] = epic_link
+        if add_link is not None:
+            entry["issuelinks"].append(add_link)
+
+def is_issue_key(value):
+    return bool(ISSUE_KEY_PATTERN.fullmatch(value or ""))
+
+def issue_missing(issue_key):
+    """True if the key is malformed or a prefetch found no such issue (no request)."""
+    with _issue_fields_lock:
+        return not is_issue_key(issue_key) or issue_key in _missing_issues
+
+def prefetch_issue_fields(issue_keys, epic_link_field):
+    """
+    Load epic link and issuelinks for every key not memoized yet,
+    PREFETCH_BATCH_SIZE keys per search request. validateQuery=false makes Jira
+    skip unknown keys; those are remembered as missing (see issue_missing).
+    """
+    with _issue_fields_lock:
+        missing = sorted({k for k in issue_keys
+                          if is_issue_key(k) and k not in _issue_fields and k not in _missing_issues})
+    for start in range(0, len(missing), PREFETCH_BATCH_SIZE):
+        batch = missing[start:start + PREFETCH_BATCH_SIZE]
+        resp = jira_request("GET", "search", params={
+            "jql": f"key in ({', '.join(batch)})",
+            "fields": f"issuelinks,{epic_link_field}",
+            "maxResults": PREFETCH_BATCH_SIZE,
+            "validateQuery": "false",
+        })
+        if resp.status_code != 200:
+            print(f"⚠️ Could not prefetch {len(batch)} issues: {resp.status_code}")
+            continue
+        found = set()
         for issue in resp.json().get("issues", []):
-            if issue["fields"]["summary"].strip().lower() == summary.strip().lower():
-                return issue
+            fields = issue.get("fields", {})
+            remember_issue_fields(issue["key"], fields.get(epic_link_field), fields.get("issuelinks", []))
+            found.add(issue["key"])
+        with _issue_fields_lock:
+            _missing_issues.update(k for k in batch if k not in found)
+    return len(missing)
+
+def find_issue_by_summary(summary, project_key, index=None, issue_type=None):
+    """
+    Return the issue whose summary matches exactly (case-insensitive).
+    With an index from build_project_index(), or the mirror enabled, the
+    lookup is local and returns a record of the given issue_type.
+    """
+    if index is not None:
+        records = index.get(normalize_summary(summary), [])
+        for record in records:
+            if not issue_type or record["type"].lower() == issue_type.lower():
+                return record
+        return None
+
+    mirror = mirror_for(project_key)
+    if mirror:
+        return mirror.find_by_summary(project_key, summary, issue_type)
+
+    escaped = summary.replace("\\", "\\\\").replace('"', '\\"')
+    jql = f'project = "{project_key}" AND summary ~ "{escaped}"'
+    for issue in search_issues(jql, "summary,issuetype"):
+        if issue["fields"]["summary"].strip().lower() == summary.strip().lower():
+            return issue
     return None
 
-def create_issue(project_key, summary, issue_type, epic_key=None, epic_link_field=None,
-                 description=None, epic_name=None, writer=None):
+def build_issue_fields(project_key, summary, issue_type, epic_key=None, epic_link_field=None,
+                       description=None, epic_name=None, parent_key=None):
     fields = {
         "project": {"key": project_key},
         "summary": summary,
@@ -22,31 +174,73 @@ def create_issue(project_key, summary, issue_type, epic_key=None, epic_link_fiel
         fields["customfield_10004"] = epic_name or summary
     if epic_key and issue_type.lower() in ["story", "task"]:
         fields[epic_link_field] = epic_key
+    if parent_key:
+        fields["parent"] = {"key": parent_key}
+    return fields
 
-    resp = jira_request("POST", "issue", json={"fields": fields})
-    if resp.status_code == 201:
-        key = resp.json()["key"]
-        print(f"Created {issue_type}: {key} ({summary})")
-        if writer:
-            writer.writerow([datetime.now(), "Created", key, issue_type, epic_key or "", ""])
-        return key
-    else:
-        print(f"Failed to create {issue_type}: {summary}")
-        return None
+def _bulk_error_message(error):
+    element = error.get("elementErrors", {})
+    messages = list(element.get("errorMessages", []))
+    messages += [f"{field}: {msg}" for field, msg in element.get("errors", {}).items()]
+    return "; ".join(messages) or f"status {error.get('status', '?')}"
 
-def get_current_epic_link(issue_key, epic_link_field):
-    resp = jira_request("GET", f"issue/{issue_key}?fields={epic_link_field}")
-    if resp.status_code == 200:
-        return resp.json()["fields"].get(epic_link_field)
-    return None
+def create_issues_bulk(items):
+    """
+    Create issues with POST issue/bulk, BULK_CREATE_SIZE per request.
+    Each item is {"fields": {...}, "writer": optional log writer, "linked": key for the log}.
+    Returns the created keys in item order (None where Jira rejected the item).
+    """
+    keys = []
+    mirror = get_mirror()
+    for start in range(0, len(items), BULK_CREATE_SIZE):
+        batch = items[start:start + BULK_CREATE_SIZE]
+        resp = jira_request("POST", "issue/bulk", json={"issueUpdates": [{"fields": i["fields"]} for i in batch]})
+
+        created, errors = [], {}
+        if resp.status_code in (201, 400):  # 400 means every element failed
+            try:
+                data = resp.json()
+            except ValueError:
+                data = {}
+            created = data.get("issues", [])
+            errors = {e.get("failedElementNumber"): _bulk_error_message(e) for e in data.get("errors", [])}
+        if not created and not errors:
+            errors = {n: f"{resp.status_code} {resp.text[:100]}" for n in range(len(batch))}
+
+        # Jira returns the created issues in request order, skipping failed elements
+        created = iter(created)
+        for n, item in enumerate(batch):
+            fields = item["fields"]
+            issue_type = fields["issuetype"]["name"]
+            writer = item.get("writer")
+            key = None if n in errors else next(created, {}).get("key")
+            if key:
+                if mirror:
+                    parent = (fields.get("parent") or {}).get("key")
+                    mirror.upsert_issue(key, issue_type, fields["summary"], parent=parent,
+                                        epic_link=None if parent else item.get("linked"))
+                print(f"Created {issue_type}: {key} ({fields['summary']})")
+                if writer:
+                    writer.writerow(log_row("Created", key, issue_type, item.get("linked")))
+            else:
+                msg = errors.get(n, "no key returned")
+                print(f"Failed to create {issue_type}: {fields['summary']} ({msg})")
+                if writer:
+                    writer.writerow(log_row("Failed", "", issue_type, item.get("linked"), f"{fields['summary']}: {msg}"))
+            keys.append(key)
+    return keys
 
 def update_epic_link(issue_key, epic_key, epic_link_field, writer=None):
     payload = {"fields": {epic_link_field: epic_key}}
     resp = jira_request("PUT", f"issue/{issue_key}", json=payload)
     if resp.status_code == 204:
+        update_cached_issue_fields(issue_key, epic_link=epic_key)
+        mirror = get_mirror()
+        if mirror:
+            mirror.set_epic_link(issue_key, epic_key)
         print(f"Updated Epic link for {issue_key} → {epic_key}")
         if writer:
-            writer.writerow([datetime.now(), "Updated Link", issue_key, "Story/Task", epic_key, ""])
+            writer.writerow(log_row("Updated Link", issue_key, "Story/Task", epic_key))
         return True
     else:
         print(f"Failed to update link for {issue_key}: {resp.text[:100]}")
@@ -1,6 +1,209 @@
-import requests
-from datetime import datetime
-from config import JIRA_URL, JIRA_TOKEN
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    JIRA_URL, JIRA_TOKEN, JIRA_POOL_SIZE, JIRA_MAX_RETRIES, JIRA_BACKOFF, JIRA_TIMEOUT,
+    JIRA_RATE_LIMIT, JIRA_RATE_BURST, JIRA_MAX_CONCURRENCY, require_credentials,
+)
+from cache_utils import cached
+
+# Statuses worth retrying. 429 is always safe to retry because Jira rejected the
+# request before doing any work; 5xx is only retried for idempotent methods so a
+# POST that may have gone through is never sent twice.
+RETRY_ANY_METHOD = {429}
+RETRY_IDEMPOTENT = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+MAX_BACKOFF = 30.0
+SEARCH_PAGE_SIZE = 100
+DEFAULT_EPIC_LINK_FIELD = "customfield_10014"
+MIN_RATE = 0.5          # never throttle below this many requests/second
+RATE_RECOVERY = 0.02    # share of the ceiling regained per successful request
+PUSHBACK_RATE = 10.0    # requests/second after the first 429 when no rate limit is set
+
+_session = None
+_session_lock = threading.Lock()
+_limiter = None
+_request_hooks = []
+
+
+class IncompleteResultsError(Exception):
+    """A paginated read failed before its last page, so the items seen so far are not the full result."""
+
+
+class RateLimiter:
+    """
+    Token bucket (requests/second) plus a cap on requests in flight, shared by
+    every thread. The rate halves on 429 (and the whole bucket waits out
+    Retry-After), follows Jira's X-RateLimit-* headers when the server sends
+    them, and creeps back up to the configured ceiling on success.
+    With rate=0 only the concurrency cap applies until Jira pushes back (429
+    or an empty X-RateLimit bucket); the bucket then starts at the server's
+    rate or PUSHBACK_RATE and recovers without a ceiling.
+    """
+
+    def __init__(self, rate, max_concurrency, burst=None):
+        self.ceiling = rate
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def acquire(self):
+        self.slots.acquire()
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def release(self):
+        self.slots.release()
+
+    def observe(self, resp):
+        """Adapt the rate to a response."""
+        headers = resp.headers
+        if self.rate <= 0 and resp.status_code != 429 and "X-RateLimit-Remaining" not in headers:
+            return
+        with self.lock:
+            # Jira Data Center: bucket refills FillRate tokens every Interval-Seconds
+            fill = _header_float(headers, "X-RateLimit-FillRate")
+            interval = _header_float(headers, "X-RateLimit-Interval-Seconds") or 1.0
+            server_rate = fill / interval if fill else None
+            remaining = _header_float(headers, "X-RateLimit-Remaining")
+            if self.rate <= 0:
+                # Leaving the unthrottled state: the bucket starts empty from now,
+                # not refilled for all the time acquire() skipped it
+                self.tokens, self.updated = 0.0, time.monotonic()
+
+            if resp.status_code == 429:
+                old = self.rate
+                slower = self.rate / 2 if old > 0 else PUSHBACK_RATE
+                self.rate = max(MIN_RATE, min(slower, server_rate or slower))
+                retry_after = _header_float(headers, "Retry-After")
+                if retry_after:
+                    # Every thread waits, not just the one that got the 429
+                    self.tokens = min(self.tokens, -retry_after * self.rate)
+                if old <= 0 or self.rate < old:
+                    print(f"⚠️ Rate limited by Jira, slowing down to {self.rate:.1f} req/s")
+            elif server_rate and remaining is not None and remaining < 1:
+                # Server bucket is empty: match its refill rate until it recovers
+                self.rate = max(MIN_RATE, min(self.rate, server_rate) if self.rate > 0 else server_rate)
+            elif resp.status_code < 400 and self.rate > 0:
+                ceiling = self.ceiling if self.ceiling > 0 else float("inf")
+                if server_rate:
+                    ceiling = min(ceiling, server_rate)
+                self.rate = min(ceiling, self.rate + (self.ceiling or PUSHBACK_RATE) * RATE_RECOVERY)
+
+
+def _header_float(headers, name):
+    try:
+        return float(headers.get(name, ""))
+    except ValueError:
+        return None
+
+
+def configure_rate_limit(rate=None, max_concurrency=None, burst=None):
+    """Replace the shared limiter (values default to JIRA_RATE_LIMIT / JIRA_MAX_CONCURRENCY / JIRA_RATE_BURST)."""
+    global _limiter
+    _limiter = RateLimiter(
+        JIRA_RATE_LIMIT if rate is None else rate,
+        JIRA_MAX_CONCURRENCY if max_concurrency is None else max_concurrency,
+        JIRA_RATE_BURST if burst is None else burst,
+    )
+    return _limiter
+
+
+def get_rate_limiter():
+    if _limiter is None:
+        with _session_lock:
+            if _limiter is None:
+                configure_rate_limit()
+    return _limiter
+
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Imported here so commands that never reach Jira (--help) start fast
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                require_credentials()
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=JIRA_POOL_SIZE, pool_maxsize=JIRA_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {JIRA_TOKEN}",
+                })
+                _session = session
+    return _session
+
+
+def add_request_hook(hook):
+    """Call hook(record) after every jira_request; see _notify_hooks for the record fields."""
+    _request_hooks.append(hook)
+
+
+def remove_request_hook(hook):
+    if hook in _request_hooks:
+        _request_hooks.remove(hook)
+
+
+def endpoint_template(endpoint):
+    """Collapse a concrete endpoint to its template, e.g. 'issue/ABC-12?fields=x' -> 'issue/{key}'."""
+    path = endpoint.split("?", 1)[0].lstrip("/")
+    path = re.sub(r"^rest/api/\d+/", "", path)
+    path = re.sub(r"(?<=/)[A-Z][A-Z0-9_]*-\d+(?=/|$)|^[A-Z][A-Z0-9_]*-\d+(?=/|$)", "{key}", path)
+    return re.sub(r"(?<=/)\d+(?=/|$)", "{id}", path)
+
+
+def _notify_hooks(method, endpoint, resp, started, retries):
+    if not _request_hooks:
+        return
+    record = {
+        "method": method.upper(),
+        "endpoint": endpoint_template(endpoint),
+        "status": resp.status_code if resp is not None else None,
+        "latency": time.perf_counter() - started,
+        "bytes": len(resp.content) if resp is not None else 0,
+        "retries": retries,
+    }
+    for hook in list(_request_hooks):
+        hook(record)
+
+
+def _retry_delay(resp, attempt):
+    """Honor Retry-After when present, otherwise exponential backoff with full jitter."""
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.strip().isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+    return random.uniform(0, min(MAX_BACKOFF, JIRA_BACKOFF * (2 ** attempt)))
+
+
+def _should_retry(method, resp):
+    if resp.status_code in RETRY_ANY_METHOD:
+        return True
+    return resp.status_code in RETRY_IDEMPOTENT and method.upper() in IDEMPOTENT_METHODS
+
 
 def jira_request(method, endpoint, **kwargs):
     """Wrapper for Jira REST API calls (supports both /rest/api/2 and /rest/agile/1.0)."""
@@ -12,39 +215,173 @@ def jira_request(method, endpoint, **kwargs):
     else:
         url = f"{JIRA_URL}/rest/api/2/{endpoint}"
 
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {JIRA_TOKEN}",
-    }
+    import requests
+
+    kwargs.setdefault("timeout", JIRA_TIMEOUT)
+    session = get_session()
+    limiter = get_rate_limiter()
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            resp, error = session.request(method, url, **kwargs), None
+        except (requests.ConnectionError, requests.Timeout) as e:
+            resp, error = None, e
+        finally:
+            limiter.release()
 
-    resp = requests.request(method, url, headers=headers, **kwargs)
+        if error is not None:
+            if method.upper() not in IDEMPOTENT_METHODS or attempt >= JIRA_MAX_RETRIES:
+                _notify_hooks(method, endpoint, None, started, attempt)
+                raise error
+            delay = _retry_delay(None, attempt)
+            print(f"{method} {endpoint} connection error ({error.__class__.__name__}), retrying in {delay:.1f}s")
+        else:
+            limiter.observe(resp)
+            if not _should_retry(method, resp) or attempt >= JIRA_MAX_RETRIES:
+                break
+            delay = _retry_delay(resp, attempt)
+            print(f"{method} {endpoint} returned {resp.status_code}, retrying in {delay:.1f}s")
+        attempt += 1
+        time.sleep(delay)
+
+    _notify_hooks(method, endpoint, resp, started, attempt)
     if resp.status_code >= 400:
         print(f"{method} {endpoint} failed: {resp.status_code} {resp.text[:200]}")
     return resp
 
+
+def iter_pages(endpoint, params=None, items_key="issues", page_size=SEARCH_PAGE_SIZE, prefetch=False):
+    """
+    Yield every item of a paginated Jira GET endpoint, following startAt until
+    total (or isLast for agile endpoints) is reached. With prefetch=True the next
+    page is requested in the background while the caller consumes the current one.
+    Raises IncompleteResultsError if a page fails (after retries), so callers never
+    mistake a partial result for the full one.
+    """
+    params = dict(params or {}, maxResults=page_size)
+
+    def fetch(start_at):
+        return jira_request("GET", endpoint, params=dict(params, startAt=start_at))
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    try:
+        start_at = 0
+        resp = fetch(start_at)
+        while True:
+            if resp.status_code != 200:
+                raise IncompleteResultsError(
+                    f"Stopped reading {endpoint} at startAt={start_at}: {resp.status_code} (results are incomplete)")
+            data = resp.json()
+            items = data.get(items_key, [])
+            next_start = start_at + len(items)
+            if "isLast" in data:
+                has_more = bool(items) and not data["isLast"]
+            else:
+                has_more = bool(items) and next_start < data.get("total", 0)
+
+            next_page = executor.submit(fetch, next_start) if has_more and executor else None
+            yield from items
+            if not has_more:
+                return
+            resp = next_page.result() if next_page else fetch(next_start)
+            start_at = next_start
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def search_issues(jql, fields=None, page_size=SEARCH_PAGE_SIZE, prefetch=False, validate_query=True):
+    """
+    Stream all issues matching a JQL query, requesting only the given fields.
+    validate_query=False makes Jira ignore unknown keys in "key in (...)" instead of failing.
+    """
+    params = {"jql": jql}
+    if not validate_query:
+        params["validateQuery"] = "false"
+    if fields:
+        params["fields"] = fields if isinstance(fields, str) else ",".join(fields)
+    return iter_pages("search", params, page_size=page_size, prefetch=prefetch)
+
+
+def search_issues_by_key(jql, fields=None, page_size=SEARCH_PAGE_SIZE):
+    """
+    Stream JQL results in key order, paging with `key > <last key>` instead of startAt.
+    Pages stay correct while the caller updates issues so they stop matching the
+    query. Keys only order within a project, so scope the JQL to one project.
+    Raises IncompleteResultsError if a page fails, like iter_pages.
+    """
+    params = {"maxResults": page_size}
+    if fields:
+        params["fields"] = fields if isinstance(fields, str) else ",".join(fields)
+    last_key = None
+    while True:
+        clause = f'({jql}) AND key > "{last_key}"' if last_key else f"({jql})"
+        resp = jira_request("GET", "search", params=dict(params, jql=f"{clause} ORDER BY key ASC"))
+        if resp.status_code != 200:
+            raise IncompleteResultsError(
+                f"Stopped reading search after {last_key or 'the first page'}: {resp.status_code} (results are incomplete)")
+        data = resp.json()
+        issues = data.get("issues", [])
+        yield from issues
+        # total counts what is left after last_key; Jira may cap the page below page_size
+        if not issues or len(issues) >= data.get("total", 0):
+            return
+        last_key = issues[-1]["key"]
+
+
+def iter_sprint_issues(sprint_id, fields=None, jql=None, page_size=SEARCH_PAGE_SIZE, prefetch=False):
+    """Stream all issues of a sprint from the agile API, optionally narrowed by JQL."""
+    params = {}
+    if fields:
+        params["fields"] = fields if isinstance(fields, str) else ",".join(fields)
+    if jql:
+        params["jql"] = jql
+    return iter_pages(f"/rest/agile/1.0/sprint/{sprint_id}/issue", params, page_size=page_size, prefetch=prefetch)
+
+
+def iter_board_sprints(board_id, state=None):
+    """Stream the sprints of an agile board, optionally filtered by state ("active", "future", "closed")."""
+    params = {"state": state} if state else {}
+    return iter_pages(f"/rest/agile/1.0/board/{board_id}/sprint", params, items_key="values", page_size=50)
+
+
 def get_epic_link_field():
-    """Auto-detect Epic Link field or default."""
-    resp = jira_request("GET", "field")
-    if resp.status_code == 200:
+    """Auto-detect Epic Link field or default (cached per Jira instance)."""
+    def load():
+        resp = jira_request("GET", "field")
+        if resp.status_code != 200:
+            return None
         for field in resp.json():
             if field.get("name") == "Epic Link":
                 return field["id"]
-    print("Using default Epic Link field: customfield_10014")
-    return "customfield_10014"
+        return ""  # no such field: cache the miss too
+
+    field_id = cached("epic_link_field", load)
+    if not field_id:
+        print(f"Using default Epic Link field: {DEFAULT_EPIC_LINK_FIELD}")
+        return DEFAULT_EPIC_LINK_FIELD
+    return field_id
 
 def get_issue_types():
-    """Return available issue types."""
-    resp = jira_request("GET", "issuetype")
-    if resp.status_code == 200:
-        types = resp.json()
-        return [t["name"] for t in types]
-    return []
+    """Return available issue types (cached per Jira instance)."""
+    def load():
+        resp = jira_request("GET", "issuetype")
+        if resp.status_code == 200:
+            types = resp.json()
+            return [t["name"] for t in types]
+        return None
+
+    return cached("issue_types", load) or []
 
 def get_link_types():
-    """Return available issue link types."""
-    resp = jira_request("GET", "issueLinkType")
-    if resp.status_code == 200:
-        types = resp.json().get("issueLinkTypes", [])
-        return [t["name"] for t in types]
-    return []
+    """Return available issue link types (cached per Jira instance)."""
+    def load():
+        resp = jira_request("GET", "issueLinkType")
+        if resp.status_code == 200:
+            types = resp.json().get("issueLinkTypes", [])
+            return [t["name"] for t in types]
+        return None
+
+    return cached("link_types", load) or []
@@ -1,109 +1,318 @@
+import argparse
+import importlib
 import sys
-from csv_utils import process_csv
-from jira_api import get_link_types, get_issue_types
-from text_utils import bulk_replace_text_in_project
-from board_utils import (
-    get_sprint_issues,
-    ensure_subtasks_for_sprint,
-    ensure_subtasks_for_issue
-)
+import time
+
+_started = time.perf_counter()
+_import_times = []
+
+# ------------------------------------------------------------
+# LAZY IMPORTS
+# ------------------------------------------------------------
+def load(module_name):
+    """Import a module on first use; the time it takes is shown by --profile-startup."""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    before = len(sys.modules)
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    _import_times.append((module_name, time.perf_counter() - started, len(sys.modules) - before))
+    return module
+
+
+def print_startup_profile(parsed_at):
+    print("⏱️  Startup profile (since jira_sync.py started, interpreter start-up not included)")
+    print(f"   {'Parse arguments':<28} {(parsed_at - _started) * 1000:>8.1f} ms")
+    for name, seconds, modules in _import_times:
+        print(f"   {'Import ' + name:<28} {seconds * 1000:>8.1f} ms  ({modules} modules)")
+    print(f"   {'Ready to run command':<28} {(time.perf_counter() - _started) * 1000:>8.1f} ms\n")
+
 
 # ------------------------------------------------------------
-# HELP MESSAGE
+# COMMANDS
 # ------------------------------------------------------------
-def print_help():
-    print("\nUsage:")
-    print("  python jira_sync.py --help")
-    print("      Show this help message and exit.\n")
+def cmd_list_link_types(args):
+    print("=== Link types ===")
+    print(load("jira_api").get_link_types())
+
+
+def cmd_list_issue_types(args):
+    print("=== Issue types ===")
+    print(load("jira_api").get_issue_types())
+
+
+def cmd_list_all(args):
+    cmd_list_link_types(args)
+    print()
+    cmd_list_issue_types(args)
+
+
+def cmd_list_sprint_issues(args):
+    load("board_utils").get_sprint_issues(args.sprint_id)
 
-    print("  python jira_sync.py --list-link-types")
-    print("      List all available Jira issue link types.\n")
 
-    print("  python jira_sync.py --list-issue-types")
-    print("      List all available Jira issue types (Epic, Story, Task, etc.).\n")
+def cmd_create_subtasks(args):
+    board_utils = load("board_utils")
+    if len(args.sprint_ids) == 1:
+        board_utils.ensure_subtasks_for_sprint(args.sprint_ids[0], fix_drift=args.fix_drift)
+    else:
+        board_utils.ensure_subtasks_for_sprints(args.sprint_ids, fix_drift=args.fix_drift,
+                                                concurrency=args.workers or board_utils.SPRINT_CONCURRENCY)
+
+
+def cmd_create_subtasks_board(args):
+    board_utils = load("board_utils")
+    sprint_ids = board_utils.get_board_sprint_ids(args.board_id, args.state)
+    board_utils.ensure_subtasks_for_sprints(sprint_ids, fix_drift=args.fix_drift,
+                                            concurrency=args.workers or board_utils.SPRINT_CONCURRENCY)
+
 
-    print("  python jira_sync.py --list-all")
-    print("      Show both link types and issue types.\n")
+def cmd_create_subtasks_for(args):
+    load("board_utils").ensure_subtasks_for_issue(args.issue_key, fix_drift=args.fix_drift)
 
-    print("  python jira_sync.py --list-sprint-issues <SPRINT_ID>")
-    print("      List all Story, Task, and Bug issues in the given sprint ID.\n")
 
-    print("  python jira_sync.py --create-subtasks <SPRINT_ID>")
-    print("      For every Story, Task, and Bug in the sprint, create subtasks:")
-    print("      'Implement', 'Review', and 'Test' if they do not already exist.\n")
+def cmd_replace_text(args):
+    text_utils = load("text_utils")
+    text_utils.bulk_replace_text_in_project(
+        args.project, args.old_text, args.new_text, regex=args.regex, ignore_case=args.ignore_case,
+        preview=args.preview, workers=args.workers or text_utils.REPLACE_WORKERS,
+    )
 
-    print("  python jira_sync.py --create-subtasks-for <ISSUE_KEY>")
-    print("      Create subtasks ('Implement', 'Review', 'Test') for a single Jira issue.\n")
 
-    print("  python jira_sync.py --replace-text <PROJECT_KEY> <OLD_TEXT> <NEW_TEXT>")
-    print("      Find all issues in the project where summary or description contains OLD_TEXT")
-    print("      and replace it with NEW_TEXT.\n")
+def cmd_sync(args):
+    csv_utils = load("csv_utils")
+    csv_utils.process_csv(args.project, args.csv, workers=args.workers or 1, mode=args.mode,
+                          dry_run=args.dry_run, chunk_size=args.chunk_size or csv_utils.CSV_CHUNK_SIZE)
+
+
+def cmd_manifest(args):
+    manifest_utils = load("manifest_utils")
+    entries = manifest_utils.sync_manifest(args.manifest, workers=args.workers,
+                                           parallel_projects=args.parallel_projects, mode=args.mode,
+                                           dry_run=args.dry_run,
+                                           chunk_size=args.chunk_size or load("csv_utils").CSV_CHUNK_SIZE)
+    if any(e["error"] for e in entries):
+        sys.exit(1)
 
-    print("  python jira_sync.py <PROJECT_KEY> <CSV_FILENAME>")
-    print("      Process a CSV file to create or update Epics, Stories, and Tasks in Jira.\n")
+
+def cmd_refresh_cache(args):
+    if not args.refresh_cache:  # already cleared as a global option
+        clear_caches()
+
+
+# ------------------------------------------------------------
+# ARGUMENT PARSING
+# ------------------------------------------------------------
+# Commands from before the subcommand CLI, still accepted
+LEGACY_COMMANDS = {
+    "--list-link-types": "list-link-types",
+    "--list-issue-types": "list-issue-types",
+    "--list-all": "list-all",
+    "--list-sprint-issues": "list-sprint-issues",
+    "--create-subtasks": "create-subtasks",
+    "--create-subtasks-board": "create-subtasks-board",
+    "--create-subtasks-for": "create-subtasks-for",
+    "--replace-text": "replace-text",
+    "--manifest": "manifest",
+}
+VALUE_OPTIONS = {"--workers", "--rate", "--max-concurrency", "--metrics-out", "--log-format", "--chunk-size",
+                 "--parallel-projects", "--templates"}
+
+
+def global_options(defaults=True):
+    """Options every command accepts. Subcommands get SUPPRESS defaults so they never reset a value."""
+    parser = argparse.ArgumentParser(add_help=False)
+    group = parser.add_argument_group("global options")
+    default = {} if defaults else {"default": argparse.SUPPRESS}
+    group.add_argument("--rate", type=float, metavar="N", **default,
+                       help="Max requests per second to Jira (0 = adapt to 429s only; env JIRA_RATE_LIMIT).")
+    group.add_argument("--max-concurrency", type=int, metavar="N", **default,
+                       help="Max requests in flight at once (env JIRA_MAX_CONCURRENCY).")
+    group.add_argument("--metrics-out", metavar="PATH", **default,
+                       help="Export the performance report as JSON (*.json) or Prometheus textfile "
+                            "(env JIRA_METRICS_FILE).")
+    group.add_argument("--log-format", choices=("csv", "jsonl"), **default,
+                       help="Write the sync log as CSV or JSON Lines (env JIRA_LOG_FORMAT, default: csv).")
+    group.add_argument("--refresh-cache", action="store_true", **default,
+                       help="Drop cached Jira metadata and the issue mirror before running.")
+    group.add_argument("--mirror", action="store_true", **default,
+                       help="Read issues, epic links, links and sub-tasks from a local SQLite mirror, "
+                            "refreshed with 'updated since last run' queries (env JIRA_MIRROR=1).")
+    group.add_argument("--profile-startup", action="store_true", **default,
+                       help="Print how long argument parsing and module imports took.")
+    return parser
+
+
+def csv_options(parser, workers_help):
+    parser.add_argument("--workers", type=int, metavar="N", help=workers_help)
+    parser.add_argument("--dry-run", action="store_true", help="Print the planned changes and API call estimate; change nothing.")
+    parser.add_argument("--chunk-size", type=int, metavar="N", help="Rows read, planned and synced together (default: 5000).")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--resume", dest="mode", action="store_const", const="resume",
+                      help="Skip rows an interrupted run of the CSV already finished.")
+    mode.add_argument("--changed-only", dest="mode", action="store_const", const="changed",
+                      help="Only process rows changed since the last complete sync.")
+
+
+def subtask_options(parser):
+    parser.add_argument("--templates", metavar="FILE",
+                        help="JSON file with sub-task templates per project and issue type "
+                             "(env JIRA_SUBTASK_TEMPLATES; default: Implement, Review, Test).")
+    parser.add_argument("--fix-drift", action="store_true",
+                        help="Rename sub-tasks whose summary differs from the template only in case, "
+                             "spacing or [Prefix] instead of creating the template name next to them.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="jira_sync.py",
+        parents=[global_options()],
+        description="Create and link Jira Epics, Stories and Tasks from CSV files, and manage sprint sub-tasks.",
+        epilog="The older forms still work: '--create-subtasks <SPRINT_ID>', '--replace-text ...', "
+               "'<PROJECT_KEY> <CSV_FILENAME>', with options anywhere on the line.",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="<command>")
+    suppressed = global_options(defaults=False)
+
+    def command(name, handler, help_text, modules=()):
+        sub = commands.add_parser(name, help=help_text, description=help_text, parents=[suppressed])
+        sub.set_defaults(handler=handler, modules=modules)
+        return sub
+
+    sub = command("sync", cmd_sync, "Process a CSV file to create or update Epics, Stories, and Tasks in Jira.",
+                  ["csv_utils"])
+    sub.add_argument("project", metavar="PROJECT_KEY")
+    sub.add_argument("csv", metavar="CSV_FILENAME")
+    csv_options(sub, "Send up to N requests in parallel per stage (default: 1).")
+
+    sub = command("manifest", cmd_manifest,
+                  "Sync every project/CSV pair of a JSON (or YAML, with PyYAML) manifest in one run.",
+                  ["manifest_utils"])
+    sub.add_argument("manifest", metavar="FILE")
+    csv_options(sub, "Total parallel requests across projects (default: 8).")
+    sub.add_argument("--parallel-projects", type=int, metavar="P", help="Projects synced at the same time (default: 4).")
+
+    command("list-link-types", cmd_list_link_types, "List all available Jira issue link types.", ["jira_api"])
+    command("list-issue-types", cmd_list_issue_types, "List all available Jira issue types.", ["jira_api"])
+    command("list-all", cmd_list_all, "Show both link types and issue types.", ["jira_api"])
+
+    sub = command("list-sprint-issues", cmd_list_sprint_issues,
+                  "List all Story, Task, and Bug issues in the given sprint.", ["board_utils"])
+    sub.add_argument("sprint_id", metavar="SPRINT_ID")
+
+    sub = command("create-subtasks", cmd_create_subtasks,
+                  "Ensure every Story, Task, and Bug of the sprint(s) has the sub-tasks of its template "
+                  "('Implement', 'Review' and 'Test' by default); several sprints are processed concurrently.",
+                  ["board_utils"])
+    sub.add_argument("sprint_ids", metavar="SPRINT_ID", nargs="+")
+    subtask_options(sub)
+    sub.add_argument("--workers", type=int, metavar="N", help="Concurrent requests for several sprints (default: 8).")
+
+    sub = command("create-subtasks-board", cmd_create_subtasks_board,
+                  "Same as create-subtasks for every sprint of a board.", ["board_utils"])
+    sub.add_argument("board_id", metavar="BOARD_ID")
+    sub.add_argument("state", metavar="STATE", nargs="?", default="active",
+                     help="Sprint state(s), e.g. active or active,future (default: active).")
+    subtask_options(sub)
+    sub.add_argument("--workers", type=int, metavar="N", help="Concurrent requests (default: 8).")
+
+    sub = command("create-subtasks-for", cmd_create_subtasks_for,
+                  "Create the missing template sub-tasks for a single issue.", ["board_utils"])
+    sub.add_argument("issue_key", metavar="ISSUE_KEY")
+    subtask_options(sub)
+
+    sub = command("replace-text", cmd_replace_text,
+                  "Replace OLD_TEXT with NEW_TEXT in the summary and description of every issue in the project.",
+                  ["text_utils"])
+    sub.add_argument("project", metavar="PROJECT_KEY")
+    sub.add_argument("old_text", metavar="OLD_TEXT")
+    sub.add_argument("new_text", metavar="NEW_TEXT")
+    sub.add_argument("--regex", action="store_true", help="OLD_TEXT is a regular expression; NEW_TEXT may use \\1 groups.")
+    sub.add_argument("--ignore-case", action="store_true", help="Match OLD_TEXT regardless of case.")
+    sub.add_argument("--preview", action="store_true", help="Print a diff of every change; update nothing.")
+    sub.add_argument("--workers", type=int, metavar="N", help="Parallel updates (default: 8).")
+
+    command("refresh-cache", cmd_refresh_cache,
+            "Drop cached Jira metadata (Epic Link field, issue/link types) and the issue mirror.")
+    return parser, set(commands.choices)
+
+
+def translate_legacy(argv, commands):
+    """
+    Rewrite the pre-subcommand syntax: '--create-subtasks 123'-style commands,
+    '<PROJECT_KEY> <CSV_FILENAME>' for a sync, options before the command, and
+    '--refresh-cache' on its own. The three values after '--replace-text' are
+    passed after '--' so texts starting with a dash are not read as options.
+    """
+    if "--replace-text" in argv:
+        i = argv.index("--replace-text")
+        values = argv[i + 1:i + 4]
+        if len(values) == 3 and not values[0].startswith("-"):
+            return ["replace-text"] + argv[:i] + argv[i + 4:] + ["--"] + values
+    argv = [LEGACY_COMMANDS.get(arg, arg) for arg in argv]
+    positional = [i for i, arg in enumerate(argv)
+                  if not arg.startswith("-") and (i == 0 or argv[i - 1] not in VALUE_OPTIONS)]
+    if not positional:
+        if "--refresh-cache" in argv and not {"-h", "--help"} & set(argv):
+            return ["refresh-cache"] + argv
+        return argv
+    first = positional[0]
+    if argv[first] in commands:
+        return [argv[first]] + argv[:first] + argv[first + 1:]
+    return ["sync"] + argv
 
 
 # ------------------------------------------------------------
 # COMMAND EXECUTION
 # ------------------------------------------------------------
+def clear_caches():
+    load("config").require_credentials()
+    load("cache_utils").invalidate()
+    load("mirror_utils").drop_mirror()
+    print("Metadata cache and issue mirror cleared.")
+
+
+def apply_global_options(args):
+    if args.rate is not None or args.max_concurrency is not None:
+        load("jira_api").configure_rate_limit(rate=args.rate, max_concurrency=args.max_concurrency)
+    if args.metrics_out:
+        load("metrics_utils").set_export_path(args.metrics_out)
+    if args.log_format:
+        load("log_utils").set_log_format(args.log_format)
+    if getattr(args, "templates", None):
+        load("template_utils").set_templates_path(args.templates)
+    if args.mirror:
+        load("mirror_utils").enable_mirror()
+    if args.refresh_cache:
+        clear_caches()
+
+
 def main():
-    args = sys.argv[1:]
-    if not args or args[0] in ["--help", "-h"]:
-        print_help()
+    parser, commands = build_parser()
+    argv = sys.argv[1:]
+    if not argv:
+        parser.print_help()
+        sys.exit(0)
+    args = parser.parse_args(translate_legacy(argv, commands))
+    parsed_at = time.perf_counter()
+    if not args.command:
+        parser.print_help()
         sys.exit(0)
 
-    command = args[0]
-
-    # --- Simple dispatch pattern ---
-    if command == "--list-link-types":
-        print("=== Link types ===")
-        print(get_link_types())
-
-    elif command == "--list-issue-types":
-        print("=== Issue types ===")
-        print(get_issue_types())
-
-    elif command == "--list-all":
-        print("=== Link types ===")
-        print(get_link_types())
-        print("\n=== Issue types ===")
-        print(get_issue_types())
-
-    elif command == "--list-sprint-issues":
-        if len(args) != 2:
-            print("❌ Usage: python jira_sync.py --list-sprint-issues <SPRINT_ID>")
-            sys.exit(1)
-        sprint_id = args[1]
-        get_sprint_issues(sprint_id)
-
-    elif command == "--create-subtasks":
-        if len(args) != 2:
-            print("❌ Usage: python jira_sync.py --create-subtasks <SPRINT_ID>")
-            sys.exit(1)
-        sprint_id = args[1]
-        ensure_subtasks_for_sprint(sprint_id)
-
-    elif command == "--create-subtasks-for":
-        if len(args) != 2:
-            print("❌ Usage: python jira_sync.py --create-subtasks-for <ISSUE_KEY>")
-            sys.exit(1)
-        issue_key = args[1]
-        ensure_subtasks_for_issue(issue_key)
-
-    elif command == "--replace-text":
-        if len(args) != 4:
-            print("❌ Usage: python jira_sync.py --replace-text <PROJECT_KEY> <OLD_TEXT> <NEW_TEXT>")
-            sys.exit(1)
-        project, old_text, new_text = args[1], args[2], args[3]
-        bulk_replace_text_in_project(project, old_text, new_text)
-
-    elif len(args) == 2:
-        project_key, csv_path = args
-        process_csv(project_key, csv_path)
+    for module_name in args.modules:
+        load(module_name)
+    if args.profile_startup:
+        print_startup_profile(parsed_at)
 
-    else:
-        print(f"❌ Unknown or invalid command: {' '.join(args)}")
-        print("Use '--help' for usage details.")
+    apply_global_options(args)
+    try:
+        args.handler(args)
+    except Exception as e:
+        # Only loaded when the command talks to Jira
+        jira_api = sys.modules.get("jira_api")
+        if jira_api is None or not isinstance(e, jira_api.IncompleteResultsError):
+            raise
+        print(f"❌ {e}")
         sys.exit(1)
 
 
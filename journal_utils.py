@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from config import JIRA_CACHE_DIR
+
+
+def row_hash(values):
+    """Stable content hash of the CSV fields that drive a row's sync."""
+    payload = json.dumps(values, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def journal_path(project_key, csv_path):
+    """One journal per project and CSV file, kept next to the metadata cache."""
+    digest = hashlib.sha1(os.path.abspath(csv_path).encode("utf-8")).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(JIRA_CACHE_DIR, "journals", f"{project_key}_{name}_{digest}.jsonl")
+
+
+class SyncJournal:
+    """
+    Append-only JSON Lines checkpoint of a CSV sync.
+
+    Every run writes a "start" event, one "row" event per row that synced
+    successfully (content hash + resulting epic/story/task keys) and an "end"
+    event once the whole file went through. On "end" the journal is compacted
+    to that run only, so it always holds the last complete sync plus whatever
+    an interrupted run managed to finish after it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.completed = {}    # hash -> keys from the last complete run
+        self.interrupted = {}  # hash -> keys from runs that never reached "end"
+        self.rows = {}         # hash -> keys recorded by the current run
+        self.run_id = None
+        self.file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        runs = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a killed run
+                if event.get("event") == "start":
+                    runs.append({"rows": {}, "ended": False})
+                elif event.get("event") == "row" and runs:
+                    runs[-1]["rows"][event["hash"]] = event.get("keys", {})
+                elif event.get("event") == "end" and runs:
+                    runs[-1]["ended"] = True
+
+        for run in runs:
+            if run["ended"]:
+                self.completed = run["rows"]
+                self.interrupted = {}
+            else:
+                self.interrupted.update(run["rows"])
+
+    def skip_set(self, mode):
+        """
+        Row hashes that need no work for the given mode:
+        "resume"  - rows finished by the interrupted run(s) since the last complete sync
+        "changed" - rows unchanged since the last complete sync (plus interrupted progress)
+        """
+        if mode == "resume":
+            return dict(self.interrupted)
+        if mode == "changed":
+            return {**self.completed, **self.interrupted}
+        return {}
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.run_id = uuid.uuid4().hex
+        self.file = open(self.path, "a", encoding="utf-8")
+        self._write({"event": "start", "run": self.run_id, "ts": datetime.now().isoformat(timespec="seconds")})
+
+    def record(self, row_hash, keys):
+        with self.lock:
+            self.rows[row_hash] = keys
+            self._write({"event": "row", "run": self.run_id, "hash": row_hash, "keys": keys})
+
+    def finish(self):
+        """Mark the run complete and compact the journal down to it."""
+        with self.lock:
+            self.file.close()
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                ts = datetime.now().isoformat(timespec="seconds")
+                f.write(json.dumps({"event": "start", "run": self.run_id, "ts": ts}) + "\n")
+                for h, keys in self.rows.items():
+                    f.write(json.dumps({"event": "row", "run": self.run_id, "hash": h, "keys": keys}) + "\n")
+                f.write(json.dumps({"event": "end", "run": self.run_id, "ts": ts}) + "\n")
+            os.replace(tmp, self.path)
+            self.file = None
+
+    def _write(self, event):
+        self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.file.flush()
@@ -1,14 +1,10 @@
-from datetime import datetime
 from jira_api import jira_request
+from log_utils import log_row
+from issue_utils import update_cached_issue_fields
+from mirror_utils import get_mirror
 
-def get_existing_links(issue_key):
-    resp = jira_request("GET", f"issue/{issue_key}?fields=issuelinks")
-    if resp.status_code == 200:
-        return resp.json()["fields"].get("issuelinks", [])
-    return []
-
-def is_already_linked(issue_key, target_key, link_type="Needs"):
-    for link in get_existing_links(issue_key):
+def has_link(issuelinks, target_key, link_type="Needs"):
+    for link in issuelinks:
         name = link.get("type", {}).get("name", "")
         inward = link.get("inwardIssue", {}).get("key", "")
         outward = link.get("outwardIssue", {}).get("key", "")
@@ -20,9 +16,14 @@ def create_issue_link(inward_key, outward_key, link_type="Needs", writer=None):
     payload = {"type": {"name": link_type}, "inwardIssue": {"key": inward_key}, "outwardIssue": {"key": outward_key}}
     resp = jira_request("POST", "issueLink", json=payload)
     if resp.status_code == 201:
+        update_cached_issue_fields(inward_key, add_link={"type": {"name": link_type}, "outwardIssue": {"key": outward_key}})
+        update_cached_issue_fields(outward_key, add_link={"type": {"name": link_type}, "inwardIssue": {"key": inward_key}})
+        mirror = get_mirror()
+        if mirror:
+            mirror.add_link(inward_key, outward_key, link_type)
         print(f"Linked {inward_key} → {outward_key} ({link_type})")
         if writer:
-            writer.writerow([datetime.now(), "Created Link", inward_key, "Link", outward_key, link_type])
+            writer.writerow(log_row("Created Link", inward_key, "Link", outward_key, link_type))
         return True
     else:
         print(f"Failed to link {inward_key} → {outward_key}: {resp.text[:100]}")
@@ -0,0 +1,148 @@
+import csv
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+from config import JIRA_LOG_FORMAT
+from jira_api import add_request_hook, remove_request_hook
+
+LOG_HEADER = ["Timestamp", "Action", "Issue Key", "Type", "Linked Epic", "Message", "Requests", "API ms"]
+LOG_FORMATS = ("csv", "jsonl")
+LOG_BATCH_SIZE = 500      # rows written per batch by the log thread
+LOG_FLUSH_INTERVAL = 1.0  # seconds before queued rows reach the file
+
+_log_format = JIRA_LOG_FORMAT if JIRA_LOG_FORMAT in LOG_FORMATS else "csv"
+_local = threading.local()
+_open_logs = 0
+_hook_lock = threading.Lock()
+_CLOSE = object()
+
+
+def set_log_format(fmt):
+    """Write sync logs as "csv" or "jsonl" (JSON Lines)."""
+    global _log_format
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format '{fmt}', expected one of {', '.join(LOG_FORMATS)}")
+    _log_format = fmt
+
+
+def log_filename(prefix="jira_log"):
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{_log_format}"
+
+
+def timestamp():
+    return datetime.now().isoformat(sep=" ", timespec="milliseconds")
+
+
+# ------------------------------------------------------------
+# Per-action request accounting
+# ------------------------------------------------------------
+def _count_request(record):
+    _local.requests = getattr(_local, "requests", 0) + 1
+    _local.latency = getattr(_local, "latency", 0.0) + record["latency"]
+
+
+def _track_requests(enabled):
+    """Count requests per thread while at least one SyncLog is open."""
+    global _open_logs
+    with _hook_lock:
+        _open_logs += 1 if enabled else -1
+        if enabled and _open_logs == 1:
+            add_request_hook(_count_request)
+        elif not enabled and _open_logs == 0:
+            remove_request_hook(_count_request)
+
+
+def reset_action_stats():
+    """Start counting requests for the next log line of the current thread from zero."""
+    _local.requests, _local.latency = 0, 0.0
+
+
+def log_row(action, issue_key="", issue_type="", linked="", message=""):
+    """
+    One log line: the current timestamp, the action fields, and the number and
+    total latency of the requests this thread made since its previous log line
+    (counted while a SyncLog is open).
+    """
+    requests, latency = getattr(_local, "requests", 0), getattr(_local, "latency", 0.0)
+    reset_action_stats()
+    return [timestamp(), action, issue_key or "", issue_type, linked or "", message, requests, round(latency * 1000, 1)]
+
+
+# ------------------------------------------------------------
+# Log sink
+# ------------------------------------------------------------
+class SyncLog:
+    """
+    Sync log with the writerow()/writerows() API of csv.writer. Rows go into a
+    queue and a background thread writes them in batches, so worker threads
+    log without waiting on the file or on each other. Rows reach the file
+    within LOG_FLUSH_INTERVAL seconds; close() writes the rest.
+    """
+
+    def __init__(self, path, fmt=None, extra_columns=()):
+        self.path = path
+        self.fmt = fmt or _log_format
+        self.header = LOG_HEADER + list(extra_columns)
+        self.queue = queue.Queue()
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.csv = csv.writer(self.file) if self.fmt == "csv" else None
+        if self.csv:
+            self.csv.writerow(self.header)
+        self.thread = threading.Thread(target=self._run, name="sync-log", daemon=True)
+        self.thread.start()
+        _track_requests(True)
+
+    def writerow(self, row):
+        self.queue.put([row])
+
+    def writerows(self, rows):
+        rows = list(rows)
+        if rows:
+            self.queue.put(rows)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                batches = [self.queue.get(timeout=LOG_FLUSH_INTERVAL)]
+            except queue.Empty:
+                batches = []
+            count = sum(len(b) for b in batches if b is not _CLOSE)
+            while count < LOG_BATCH_SIZE:
+                try:
+                    batch = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                batches.append(batch)
+                if batch is not _CLOSE:
+                    count += len(batch)
+            for batch in batches:
+                if batch is not _CLOSE:
+                    self._write(batch)
+            closing = _CLOSE in batches
+            if closing or time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL:
+                self.file.flush()
+                last_flush = time.monotonic()
+            if closing:
+                return
+
+    def _write(self, rows):
+        if self.csv:
+            self.csv.writerows(rows)
+        else:
+            self.file.writelines(json.dumps(dict(zip(self.header, row)), ensure_ascii=False) + "\n" for row in rows)
+
+    def close(self):
+        _track_requests(False)
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
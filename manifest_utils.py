@@ -0,0 +1,158 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+try:
+    import yaml
+except ImportError:  # YAML manifests are optional
+    yaml = None
+
+from csv_utils import CSV_CHUNK_SIZE, sync_csv
+from jira_api import get_epic_link_field
+from log_utils import SyncLog, log_filename
+from metrics_utils import instrumented
+
+MANIFEST_WORKERS = 8        # global budget of parallel requests
+MAX_PARALLEL_PROJECTS = 4
+MODES = (None, "resume", "changed")
+
+
+# ------------------------------------------------------------
+# Manifest
+# ------------------------------------------------------------
+def load_manifest(path):
+    """
+    Read a sync manifest, JSON or (with PyYAML installed) YAML:
+
+        {"workers": 8, "parallel_projects": 4,
+         "projects": [{"project": "ABC", "csv": "abc.csv"},
+                      {"project": "XYZ", "csv": "xyz.csv", "mode": "changed"}]}
+
+    A bare list of project entries works too. CSV paths are relative to the
+    manifest. Returns (settings, entries).
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    except OSError as e:
+        print(f"❌ Cannot read manifest {path}: {e}")
+        sys.exit(1)
+
+    if path.lower().endswith((".yaml", ".yml")):
+        if yaml is None:
+            print("❌ YAML manifests need PyYAML (pip install pyyaml); use a JSON manifest otherwise.")
+            sys.exit(1)
+        data = yaml.safe_load(text)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            print(f"❌ Invalid JSON in manifest {path}: {e}")
+            sys.exit(1)
+
+    if isinstance(data, list):
+        data = {"projects": data}
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for n, entry in enumerate((data or {}).get("projects") or [], 1):
+        if not isinstance(entry, dict) or not entry.get("project") or not entry.get("csv") \
+                or entry.get("mode") not in MODES:
+            print(f"❌ Invalid manifest entry #{n}: {entry}")
+            print('   Expected {"project": "<KEY>", "csv": "<FILE>"} with optional "mode": "resume" or "changed".')
+            sys.exit(1)
+        entries.append({"project": entry["project"], "csv": os.path.join(base, entry["csv"]), "mode": entry.get("mode")})
+    if not entries:
+        print(f"❌ Manifest {path} lists no projects.")
+        sys.exit(1)
+    return data, entries
+
+
+class SourceLogWriter:
+    """Writes log lines of one manifest entry to the combined log, tagged with their source."""
+
+    def __init__(self, writer, source):
+        self.writer = writer
+        self.source = source
+
+    def writerow(self, row):
+        self.writer.writerow(list(row) + [self.source])
+
+    def writerows(self, rows):
+        self.writer.writerows(list(row) + [self.source] for row in rows)
+
+
+# ------------------------------------------------------------
+# Orchestration
+# ------------------------------------------------------------
+@instrumented("Manifest sync")
+def sync_manifest(manifest_path, workers=None, parallel_projects=None, mode=None, dry_run=False,
+                  chunk_size=CSV_CHUNK_SIZE):
+    """
+    Sync every project/CSV pair of a manifest in one process, sharing the HTTP
+    pool, the metadata cache and the project indexes. CSVs of the same project
+    run one after another; different projects run in parallel, parallel_projects
+    at a time, splitting a global budget of `workers` parallel requests. All
+    entries write one combined log. mode applies to entries without their own.
+    """
+    settings, entries = load_manifest(manifest_path)
+    workers = workers or settings.get("workers") or MANIFEST_WORKERS
+    by_project = {}
+    for entry in entries:
+        by_project.setdefault(entry["project"], []).append(entry)
+    parallel = parallel_projects or settings.get("parallel_projects") or MAX_PARALLEL_PROJECTS
+    parallel = max(1, min(parallel, len(by_project)))
+    per_project = max(1, workers // parallel)
+
+    print(f"🗂️  Manifest {manifest_path}: {len(entries)} CSVs in {len(by_project)} projects, "
+          f"{parallel} projects at a time, {per_project} workers each.")
+    # Resolve shared metadata once, before the projects start
+    get_epic_link_field()
+
+    def run_project(project_entries, writer):
+        for entry in project_entries:
+            source = f"{entry['project']}:{os.path.basename(entry['csv'])}"
+            log = SourceLogWriter(writer, source) if writer else None
+            entry["counts"], entry["error"] = None, None
+            try:
+                entry["counts"] = sync_csv(entry["project"], entry["csv"], per_project, entry["mode"] or mode,
+                                           dry_run, chunk_size, writer=log)
+            except SystemExit:
+                entry["error"] = "aborted"
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+            if entry["error"]:
+                print(f"❌ {source} failed: {entry['error']}")
+
+    log_path = None
+    with ExitStack() as stack:
+        writer = None
+        if not dry_run:
+            log_path = log_filename()
+            writer = stack.enter_context(SyncLog(log_path, extra_columns=["Source"]))
+        with ThreadPoolExecutor(max_workers=parallel) as pool:
+            list(pool.map(lambda project_entries: run_project(project_entries, writer), by_project.values()))
+
+    print_manifest_report(entries)
+    if log_path:
+        print(f"\nCombined log saved to {log_path}")
+    return entries
+
+
+def print_manifest_report(entries):
+    print("\n📋 Manifest summary")
+    width = max(len(f"{e['project']}:{os.path.basename(e['csv'])}") for e in entries)
+    print(f"   {'Source':<{width}}  {'Rows':>7} {'Create':>7} {'Relink':>7} {'Links':>7} {'Calls':>7}  Status")
+    for e in entries:
+        source = f"{e['project']}:{os.path.basename(e['csv'])}"
+        c = e.get("counts")
+        if not c:
+            print(f"   {source:<{width}}  {'':>7} {'':>7} {'':>7} {'':>7} {'':>7}  ❌ {e.get('error')}")
+            continue
+        creates = c["create_epic"] + c["create_story"] + c["create_task"]
+        print(f"   {source:<{width}}  {c['rows']:>7} {creates:>7} {c['update_epic_link']:>7} "
+              f"{c['add_link']:>7} {c['api_calls']:>7}  ✅")
+    failed = sum(1 for e in entries if e.get("error"))
+    if failed:
+        print(f"\n❌ {failed} of {len(entries)} CSVs failed.")
@@ -0,0 +1,165 @@
+import functools
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+
+from config import JIRA_METRICS_FILE
+from jira_api import add_request_hook, remove_request_hook
+
+_export_path = JIRA_METRICS_FILE
+
+
+def set_export_path(path):
+    """Write every run report to path (.json, or Prometheus textfile for anything else)."""
+    global _export_path
+    _export_path = path
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class RequestMetrics:
+    """Collects one record per jira_request call while registered as a request hook."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.records = []
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.wall = None
+
+    def __call__(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def start(self):
+        add_request_hook(self)
+        return self
+
+    def stop(self):
+        remove_request_hook(self)
+        self.wall = time.perf_counter() - self.started
+
+    def summary(self):
+        groups = {}
+        with self.lock:
+            records = list(self.records)
+        for r in records:
+            groups.setdefault(f"{r['method']} {r['endpoint']}", []).append(r)
+
+        endpoints = {}
+        for name, group in sorted(groups.items()):
+            latencies = sorted(r["latency"] for r in group)
+            endpoints[name] = {
+                "calls": len(group),
+                "errors": sum(1 for r in group if r["status"] is None or r["status"] >= 400),
+                "retries": sum(r["retries"] for r in group),
+                "bytes": sum(r["bytes"] for r in group),
+                "latency_total": sum(latencies),
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+            }
+        all_latencies = sorted(r["latency"] for r in records)
+        return {
+            "run": self.name,
+            "started": self.started_at.isoformat(timespec="seconds"),
+            "wall_seconds": self.wall if self.wall is not None else time.perf_counter() - self.started,
+            "calls": len(records),
+            "retries": sum(e["retries"] for e in endpoints.values()),
+            "bytes": sum(e["bytes"] for e in endpoints.values()),
+            "p50": percentile(all_latencies, 50),
+            "p95": percentile(all_latencies, 95),
+            "p99": percentile(all_latencies, 99),
+            "endpoints": endpoints,
+        }
+
+    def print_report(self):
+        s = self.summary()
+        print(f"\n📊 Performance report: {s['run']}")
+        print(f"   Wall time {s['wall_seconds']:.2f}s, {s['calls']} API calls, {s['retries']} retries, "
+              f"{s['bytes'] / 1024:.0f} KiB received")
+        if not s["endpoints"]:
+            return s
+        width = max(len(name) for name in s["endpoints"])
+        print(f"   {'Endpoint':<{width}}  {'Calls':>6} {'Err':>4} {'Retry':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Total s':>8}")
+        for name, e in s["endpoints"].items():
+            print(f"   {name:<{width}}  {e['calls']:>6} {e['errors']:>4} {e['retries']:>5} "
+                  f"{e['p50'] * 1000:>8.1f} {e['p95'] * 1000:>8.1f} {e['p99'] * 1000:>8.1f} {e['latency_total']:>8.2f}")
+        print(f"   {'All':<{width}}  {s['calls']:>6} {'':>4} {s['retries']:>5} "
+              f"{s['p50'] * 1000:>8.1f} {s['p95'] * 1000:>8.1f} {s['p99'] * 1000:>8.1f}")
+        return s
+
+    def export(self, path):
+        s = self.summary()
+        if path.endswith(".json"):
+            content = json.dumps(s, indent=2)
+        else:
+            content = to_prometheus(s)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+        print(f"   Metrics written to {path}")
+
+
+def to_prometheus(s):
+    """Render a summary in the node_exporter textfile format."""
+    run = s["run"]
+    lines = [
+        "# HELP jira_sync_wall_seconds Wall time of the run.",
+        "# TYPE jira_sync_wall_seconds gauge",
+        f'jira_sync_wall_seconds{{run="{run}"}} {s["wall_seconds"]:.6f}',
+        "# HELP jira_sync_requests_total Jira API calls per endpoint.",
+        "# TYPE jira_sync_requests_total gauge",
+    ]
+    for name, e in s["endpoints"].items():
+        method, endpoint = name.split(" ", 1)
+        lines.append(f'jira_sync_requests_total{{run="{run}",method="{method}",endpoint="{endpoint}"}} {e["calls"]}')
+    lines += ["# HELP jira_sync_request_errors_total Failed Jira API calls per endpoint.",
+              "# TYPE jira_sync_request_errors_total gauge"]
+    for name, e in s["endpoints"].items():
+        method, endpoint = name.split(" ", 1)
+        lines.append(f'jira_sync_request_errors_total{{run="{run}",method="{method}",endpoint="{endpoint}"}} {e["errors"]}')
+    lines += ["# HELP jira_sync_request_retries_total Retries per endpoint.",
+              "# TYPE jira_sync_request_retries_total gauge"]
+    for name, e in s["endpoints"].items():
+        method, endpoint = name.split(" ", 1)
+        lines.append(f'jira_sync_request_retries_total{{run="{run}",method="{method}",endpoint="{endpoint}"}} {e["retries"]}')
+    lines += ["# HELP jira_sync_request_latency_seconds Request latency quantiles per endpoint.",
+              "# TYPE jira_sync_request_latency_seconds gauge"]
+    for name, e in s["endpoints"].items():
+        method, endpoint = name.split(" ", 1)
+        for q in ("p50", "p95", "p99"):
+            quantile = f"0.{q[1:]}"
+            lines.append(f'jira_sync_request_latency_seconds{{run="{run}",method="{method}",endpoint="{endpoint}",'
+                         f'quantile="{quantile}"}} {e[q]:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+def instrumented(name):
+    """Decorator: record every API call made by the function and print a report when it returns."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            metrics = RequestMetrics(name).start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.stop()
+                metrics.print_report()
+                if _export_path:
+                    metrics.export(_export_path)
+        return wrapper
+    return decorator
@@ -0,0 +1,292 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from config import JIRA_URL, JIRA_CACHE_DIR, JIRA_MIRROR
+from jira_api import IncompleteResultsError, get_epic_link_field, search_issues
+
+MIRROR_PAGE_SIZE = 1000
+DELTA_OVERLAP = 120  # seconds re-read before the last sync: JQL dates have minute precision
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    key TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    type TEXT,
+    summary TEXT,
+    norm_summary TEXT,
+    epic_link TEXT,
+    parent TEXT
+);
+CREATE INDEX IF NOT EXISTS issues_by_summary ON issues (project, norm_summary);
+CREATE INDEX IF NOT EXISTS issues_by_parent ON issues (parent);
+
+-- One row per link: `source` lists it as outwardIssue `target`, `target` as inwardIssue `source`
+CREATE TABLE IF NOT EXISTS links (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (source, target, type)
+);
+CREATE INDEX IF NOT EXISTS links_by_target ON links (target);
+
+CREATE TABLE IF NOT EXISTS projects (
+    project TEXT PRIMARY KEY,
+    epic_link_field TEXT,
+    synced_at REAL
+);
+"""
+
+_enabled = JIRA_MIRROR
+_mirror = None
+_synced = set()          # projects brought up to date in this process
+_sync_locks = {}
+_lock = threading.Lock()
+
+
+def mirror_path():
+    """One SQLite file per Jira instance, next to the metadata cache."""
+    digest = hashlib.sha1(JIRA_URL.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(JIRA_CACHE_DIR, f"mirror_{digest}.sqlite")
+
+
+def project_of(issue_key):
+    return issue_key.rsplit("-", 1)[0]
+
+
+def normalize(summary):
+    return (summary or "").strip().lower()
+
+
+class IssueMirror:
+    """
+    Local SQLite copy of the issues (type, summary, epic link, parent) and
+    issue links of the projects it has synced. All methods are thread-safe.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    # ------------------------------------------------------------
+    # Sync from Jira
+    # ------------------------------------------------------------
+    def sync_project(self, project_key, epic_link_field):
+        """
+        Bring the project up to date: a full load the first time (or when the
+        Epic Link field changed), afterwards only issues with `updated >=` the
+        last sync. Deleted issues are not detected; --refresh-cache reloads.
+        The delta window is relative ("-90m") because Jira reads absolute dates
+        in the user's profile timezone. The sync time is only saved after every
+        page was read, so an interrupted run is repeated on the next one.
+        """
+        with self.lock:
+            row = self.db.execute("SELECT epic_link_field, synced_at FROM projects WHERE project = ?",
+                                  (project_key,)).fetchone()
+        last_sync = row[1] if row and row[0] == epic_link_field else None
+
+        started = time.time()
+        jql = f'project = "{project_key}"'
+        if last_sync:
+            minutes = math.ceil((started - last_sync + DELTA_OVERLAP) / 60)
+            jql += f' AND updated >= "-{minutes}m"'
+            print(f"Mirror: fetching {project_key} changes of the last {minutes} minutes...")
+        else:
+            print(f"Mirror: loading all issues of {project_key}...")
+
+        fields = f"summary,issuetype,parent,issuelinks,{epic_link_field}"
+        batch, count = [], 0
+        try:
+            for issue in search_issues(f"{jql} ORDER BY key ASC", fields, page_size=MIRROR_PAGE_SIZE, prefetch=True):
+                batch.append(issue)
+                if len(batch) >= MIRROR_PAGE_SIZE:
+                    count += self._store(project_key, batch, epic_link_field)
+                    batch = []
+        except IncompleteResultsError:
+            print(f"Mirror: {project_key} sync stopped after {count} issues; it is repeated on the next run.")
+            raise
+        count += self._store(project_key, batch, epic_link_field)
+
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO projects (project, epic_link_field, synced_at) VALUES (?, ?, ?)",
+                            (project_key, epic_link_field, started))
+            total = self.db.execute("SELECT COUNT(*) FROM issues WHERE project = ?", (project_key,)).fetchone()[0]
+        print(f"Mirror: {count} issues {'updated' if last_sync else 'loaded'}, {total} in {project_key}.")
+
+    def _store(self, project_key, issues, epic_link_field):
+        if not issues:
+            return 0
+        with self.lock, self.db:
+            for issue in issues:
+                key, fields = issue["key"], issue.get("fields", {})
+                summary = fields.get("summary") or ""
+                self.db.execute(
+                    "INSERT OR REPLACE INTO issues (key, project, type, summary, norm_summary, epic_link, parent) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, project_key, (fields.get("issuetype") or {}).get("name", ""), summary,
+                     normalize(summary), fields.get(epic_link_field), (fields.get("parent") or {}).get("key")),
+                )
+                # The issue's issuelinks are complete for both directions: replace them
+                self.db.execute("DELETE FROM links WHERE source = ? OR target = ?", (key, key))
+                self.db.executemany("INSERT OR IGNORE INTO links (source, target, type) VALUES (?, ?, ?)",
+                                    _link_rows(key, fields.get("issuelinks", [])))
+        return len(issues)
+
+    # ------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------
+    def records(self, project_key, issue_types=None):
+        """Every issue of the project (of the given types) as an index record."""
+        with self.lock:
+            rows = self.db.execute("SELECT key, summary, type, epic_link FROM issues WHERE project = ? ORDER BY rowid",
+                                   (project_key,)).fetchall()
+            links = self._links_by_issue(project_key)
+        wanted = {t.lower() for t in issue_types} if issue_types else None
+        return [
+            {"key": key, "summary": summary, "type": issue_type, "epic_link": epic_link,
+             "issuelinks": links.get(key, [])}
+            for key, summary, issue_type, epic_link in rows
+            if wanted is None or (issue_type or "").lower() in wanted
+        ]
+
+    def find_by_summary(self, project_key, summary, issue_type=None):
+        """Index record of the issue with this summary (case-insensitive) and, if given, issue_type."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT key, summary, type, epic_link FROM issues WHERE project = ? AND norm_summary = ? ORDER BY rowid",
+                (project_key, normalize(summary)),
+            ).fetchall()
+        for key, found_summary, found_type, epic_link in rows:
+            if not issue_type or (found_type or "").lower() == issue_type.lower():
+                return {"key": key, "summary": found_summary, "type": found_type, "epic_link": epic_link,
+                        "issuelinks": self.issuelinks(key)}
+        return None
+
+    def issuelinks(self, issue_key):
+        """The issue's links in Jira's issuelinks format."""
+        with self.lock:
+            outward = self.db.execute("SELECT target, type FROM links WHERE source = ?", (issue_key,)).fetchall()
+            inward = self.db.execute("SELECT source, type FROM links WHERE target = ?", (issue_key,)).fetchall()
+        return ([{"type": {"name": t}, "outwardIssue": {"key": k}} for k, t in outward]
+                + [{"type": {"name": t}, "inwardIssue": {"key": k}} for k, t in inward])
+
+    def issue_type(self, issue_key):
+        with self.lock:
+            row = self.db.execute("SELECT type FROM issues WHERE key = ?", (issue_key,)).fetchone()
+        return row[0] if row else None
+
+    def subtasks(self, issue_key):
+        """Sub-tasks of a mirrored issue in Jira's subtasks format, or None if the issue is unknown."""
+        with self.lock:
+            if not self.db.execute("SELECT 1 FROM issues WHERE key = ?", (issue_key,)).fetchone():
+                return None
+            rows = self.db.execute("SELECT key, summary FROM issues WHERE parent = ? ORDER BY rowid",
+                                   (issue_key,)).fetchall()
+        return [{"key": key, "fields": {"summary": summary}} for key, summary in rows]
+
+    def _links_by_issue(self, project_key):
+        links = {}
+        project_keys = "SELECT key FROM issues WHERE project = ?"
+        for source, target, link_type in self.db.execute(
+                f"SELECT source, target, type FROM links WHERE source IN ({project_keys}) OR target IN ({project_keys})",
+                (project_key, project_key)):
+            links.setdefault(source, []).append({"type": {"name": link_type}, "outwardIssue": {"key": target}})
+            links.setdefault(target, []).append({"type": {"name": link_type}, "inwardIssue": {"key": source}})
+        return links
+
+    # ------------------------------------------------------------
+    # Write-through after successful Jira writes
+    # ------------------------------------------------------------
+    def upsert_issue(self, issue_key, issue_type, summary, epic_link=None, parent=None):
+        with self.lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO issues (key, project, type, summary, norm_summary, epic_link, parent) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (issue_key, project_of(issue_key), issue_type, summary, normalize(summary), epic_link, parent),
+            )
+
+    def set_epic_link(self, issue_key, epic_key):
+        with self.lock, self.db:
+            self.db.execute("UPDATE issues SET epic_link = ? WHERE key = ?", (epic_key, issue_key))
+
+    def set_summary(self, issue_key, summary):
+        with self.lock, self.db:
+            self.db.execute("UPDATE issues SET summary = ?, norm_summary = ? WHERE key = ?",
+                            (summary, normalize(summary), issue_key))
+
+    def add_link(self, source_key, target_key, link_type):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO links (source, target, type) VALUES (?, ?, ?)",
+                            (source_key, target_key, link_type))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def _link_rows(issue_key, issuelinks):
+    for link in issuelinks:
+        link_type = (link.get("type") or {}).get("name", "")
+        if link.get("outwardIssue"):
+            yield issue_key, link["outwardIssue"]["key"], link_type
+        elif link.get("inwardIssue"):
+            yield link["inwardIssue"]["key"], issue_key, link_type
+
+
+# ------------------------------------------------------------
+# Process-wide access
+# ------------------------------------------------------------
+def enable_mirror(enabled=True):
+    """Turn the mirror on or off for this process (JIRA_MIRROR sets the default)."""
+    global _enabled
+    _enabled = enabled
+
+
+def get_mirror():
+    """The process-wide mirror, or None when the mirror is disabled."""
+    global _mirror
+    if not _enabled:
+        return None
+    with _lock:
+        if _mirror is None:
+            _mirror = IssueMirror(mirror_path())
+        return _mirror
+
+
+def mirror_for(project_key, epic_link_field=None):
+    """
+    The mirror, synced for project_key in this process (a delta query the first
+    time the project is used), or None when the mirror is disabled.
+    """
+    mirror = get_mirror()
+    if mirror is None:
+        return None
+    with _lock:
+        lock = _sync_locks.setdefault(project_key, threading.Lock())
+    with lock:
+        if project_key not in _synced:
+            mirror.sync_project(project_key, epic_link_field or get_epic_link_field())
+            _synced.add(project_key)
+    return mirror
+
+
+def drop_mirror():
+    """Delete the mirror file; the next use of each project reloads it in full."""
+    global _mirror
+    with _lock:
+        if _mirror is not None:
+            _mirror.close()
+            _mirror = None
+        _synced.clear()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(mirror_path() + suffix)
+            except FileNotFoundError:
+                pass
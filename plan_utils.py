@@ -0,0 +1,304 @@
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from issue_utils import (
+    BULK_CREATE_SIZE,
+    add_to_index,
+    normalize_summary,
+    find_issue_by_summary,
+    build_issue_fields,
+    create_issues_bulk,
+    cached_issue_fields,
+    issue_missing,
+    remember_issue_fields,
+    update_epic_link,
+)
+from link_utils import has_link, create_issue_link
+from log_utils import log_row, reset_action_stats
+
+
+class RowLogBuffer:
+    """Collects log lines of one operation (same writerow() API as csv.writer)."""
+
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+
+# ------------------------------------------------------------
+# Planning (no requests)
+# ------------------------------------------------------------
+def build_plan(project_key, rows, index, epic_link_field, link_type="Needs"):
+    """
+    Turn CSV rows into an explicit change set, using only the project index and
+    the memoized issue fields (call prefetch_issue_fields() first).
+
+    rows is a list of (row_no, values, row_hash). Every distinct Epic/Story/Task
+    becomes one node {"type", "summary", "key", "epic", "rows", ...}; nodes
+    without a key are created, Story/Task nodes whose epic differs get an
+    epic-link update. If a Story/Task shows up under several epics, the last
+    row wins, as it would when rows are applied one after another.
+
+    Each distinct (source, target, type) link is planned once. It counts as
+    existing if the memoized issuelinks of either side contain it. It is
+    invalid if its target does not exist in Jira (see prefetch_rows).
+    """
+    nodes = {}
+    links = {}
+    plan = {"nodes": [], "links": [], "rows": {}, "incomplete": []}
+
+    def node(issue_type, summary, description=None):
+        node_id = (issue_type, normalize_summary(summary))
+        if node_id not in nodes:
+            issue = find_issue_by_summary(summary, project_key, index, issue_type)
+            nodes[node_id] = {
+                "type": issue_type,
+                "summary": summary,
+                "description": description,
+                "key": issue["key"] if issue else None,
+                "existing": bool(issue),
+                "epic": None,
+                "action": None,
+                "rows": [],
+                "failed": False,
+            }
+            plan["nodes"].append(nodes[node_id])
+        return nodes[node_id]
+
+    def link(source, target_key, row_no):
+        link_id = (source["type"], normalize_summary(source["summary"]), target_key, link_type)
+        if link_id not in links:
+            cached = cached_issue_fields(source["key"]) if source["key"] else None
+            target = cached_issue_fields(target_key) if source["key"] else None
+            links[link_id] = {
+                "source": source,
+                "target": target_key,
+                "type": link_type,
+                "exists": bool(cached and has_link(cached["issuelinks"], target_key, link_type))
+                          or bool(target and has_link(target["issuelinks"], source["key"], link_type)),
+                "invalid": issue_missing(target_key),
+                "rows": [],
+                "failed": False,
+            }
+            plan["links"].append(links[link_id])
+        links[link_id]["rows"].append(row_no)
+        return links[link_id]
+
+    for row_no, values, row_hash in rows:
+        if not (values["epic"] and values["story"] and values["task"]):
+            plan["incomplete"].append((row_no, values))
+            continue
+
+        epic = node("Epic", values["epic"], values["epic_description"])
+        story = node("Story", values["story"], values["story_description"])
+        task = node("Task", values["task"])
+        story["epic"] = epic
+        task["epic"] = epic
+
+        row_links = []
+        if values["epic_upper_link"]:
+            row_links.append(link(epic, values["epic_upper_link"], row_no))
+        if values["story_upper_link"]:
+            row_links.append(link(story, values["story_upper_link"], row_no))
+
+        for n in (epic, story, task):
+            if not n["rows"] or n["rows"][-1] != row_no:
+                n["rows"].append(row_no)
+        plan["rows"][row_no] = {"hash": row_hash, "nodes": [epic, story, task], "links": row_links}
+
+    for n in plan["nodes"]:
+        if not n["existing"]:
+            n["action"] = "create"
+        elif n["type"] == "Epic":
+            n["action"] = "none"
+        else:
+            cached = cached_issue_fields(n["key"])
+            current_epic = cached["epic_link"] if cached else None
+            if n["epic"]["existing"] and current_epic == n["epic"]["key"]:
+                n["action"] = "none"
+            else:
+                n["action"] = "update_epic"
+    return plan
+
+
+def plan_counts(plan):
+    creates = [n for n in plan["nodes"] if n["action"] == "create"]
+    epic_creates = sum(1 for n in creates if n["type"] == "Epic")
+    counts = {
+        "rows": len(plan["rows"]),
+        "incomplete": len(plan["incomplete"]),
+        "create_epic": epic_creates,
+        "create_story": sum(1 for n in creates if n["type"] == "Story"),
+        "create_task": sum(1 for n in creates if n["type"] == "Task"),
+        "update_epic_link": sum(1 for n in plan["nodes"] if n["action"] == "update_epic"),
+        "add_link": sum(1 for l in plan["links"] if not l["exists"] and not l["invalid"]),
+        "invalid_link": sum(1 for l in plan["links"] if l["invalid"]),
+        "no_change": sum(1 for n in plan["nodes"] if n["action"] == "none"),
+        "link_exists": sum(1 for l in plan["links"] if l["exists"]),
+    }
+    # Epics go first (children need their keys), then Stories/Tasks together
+    counts["api_calls"] = (
+        math.ceil(epic_creates / BULK_CREATE_SIZE)
+        + math.ceil((len(creates) - epic_creates) / BULK_CREATE_SIZE)
+        + counts["update_epic_link"]
+        + counts["add_link"]
+    )
+    return counts
+
+
+def print_plan_changes(plan):
+    for n in plan["nodes"]:
+        if n["action"] == "create":
+            epic = f" under Epic '{n['epic']['summary']}'" if n["epic"] else ""
+            print(f"  + create {n['type']}: {n['summary']}{epic}")
+        elif n["action"] == "update_epic":
+            print(f"  ~ epic link {n['key']} ({n['type']}) → {n['epic']['key'] or n['epic']['summary']}")
+    for l in plan["links"]:
+        if l["invalid"]:
+            print(f"  ! link {l['source']['key'] or l['source']['summary']} → {l['target']}: target does not exist")
+        elif not l["exists"]:
+            print(f"  + link {l['source']['key'] or l['source']['summary']} → {l['target']} ({l['type']})")
+
+
+def print_plan_counts(counts, title="Sync plan"):
+    print(f"\n📋 {title}")
+    print(f"   Rows:               {counts['rows']} ({counts['incomplete']} incomplete skipped)")
+    print(f"   Create Epics:       {counts['create_epic']}")
+    print(f"   Create Stories:     {counts['create_story']}")
+    print(f"   Create Tasks:       {counts['create_task']}")
+    print(f"   Update Epic links:  {counts['update_epic_link']}")
+    print(f"   Add issue links:    {counts['add_link']}"
+          + (f" ({counts['invalid_link']} with a missing target skipped)" if counts.get("invalid_link") else ""))
+    print(f"   No change:          {counts['no_change']} issues, {counts['link_exists']} links")
+    print(f"   Estimated write API calls: {counts['api_calls']}")
+    return counts
+
+
+# ------------------------------------------------------------
+# Execution
+# ------------------------------------------------------------
+def run_logged(fn, items, writer, workers=1):
+    """
+    Call fn(item, buffer) for every item, up to `workers` at a time, then write
+    each item's log lines in item order so the log does not depend on timing.
+    The requests of an item are counted from its start (see log_row).
+    """
+    def run(item, buf):
+        reset_action_stats()
+        fn(item, buf)
+
+    buffers = [RowLogBuffer() for _ in items]
+    if workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, items, buffers))
+    else:
+        for item, buf in zip(items, buffers):
+            run(item, buf)
+    for buf in buffers:
+        writer.writerows(buf.rows)
+
+
+def execute_plan(plan, project_key, epic_link_field, index, writer, workers=1, on_row_done=None):
+    """
+    Apply a plan stage by stage: Epic creates, Story/Task creates (both through
+    issue/bulk), epic-link updates, then issue links; each stage runs its
+    requests on up to `workers` threads. on_row_done(row_no, ok, keys) fires as
+    soon as every operation of a CSV row has finished.
+    """
+    reset_action_stats()  # the searches before the plan are not part of any logged action
+    lock = threading.Lock()
+    pending = {row_no: len(r["nodes"]) + len(r["links"]) for row_no, r in plan["rows"].items()}
+
+    def done(op, ok=True):
+        finished = []
+        with lock:
+            if not ok:
+                op["failed"] = True
+            for row_no in op["rows"]:
+                pending[row_no] -= 1
+                if pending[row_no] == 0:
+                    finished.append(row_no)
+        for row_no in finished:
+            row = plan["rows"][row_no]
+            ok_row = not any(n["failed"] for n in row["nodes"]) and not any(l["failed"] for l in row["links"])
+            if on_row_done:
+                on_row_done(row_no, ok_row, {n["type"].lower(): n["key"] for n in row["nodes"]})
+
+    def skip(op, issue_type, message, log):
+        # Log the known key (a node's own, a link's source) so the row can be matched in Jira
+        issue_key = op["source"]["key"] if "source" in op else op.get("key")
+        print(f"Skipped {issue_type}: {message}")
+        log.writerow(log_row("Skipped", issue_key, issue_type, op.get("target", ""), message))
+        done(op, ok=False)
+
+    for row_no, values in plan["incomplete"]:
+        msg = f"Incomplete row: {values}"
+        print(msg)
+        writer.writerow(log_row("Skipped", "", "Row", "", msg))
+
+    for n in plan["nodes"]:
+        if n["action"] == "none":
+            writer.writerow(log_row("No Change", n["key"], n["type"], n["epic"]["key"] if n["epic"] else ""))
+            done(n)
+
+    # --- Creates: Epics first, then Stories/Tasks that need the epic keys
+    def create_chunk(chunk, log):
+        items = []
+        for n in chunk:
+            epic_key = n["epic"]["key"] if n["epic"] else None
+            fields = build_issue_fields(
+                project_key,
+                n["summary"],
+                n["type"],
+                epic_key=epic_key,
+                epic_link_field=epic_link_field,
+                description=n["description"],
+                epic_name=n["summary"] if n["type"] == "Epic" else None,
+            )
+            items.append({"fields": fields, "writer": log, "linked": epic_key})
+        for n, key in zip(chunk, create_issues_bulk(items)):
+            n["key"] = key
+            if key:
+                epic_key = n["epic"]["key"] if n["epic"] else None
+                add_to_index(index, key, n["summary"], n["type"], epic_link=epic_key)
+                remember_issue_fields(key, epic_key, [])
+            done(n, ok=bool(key))
+
+    for stage in ("Epic", "Child"):
+        creates = []
+        for n in plan["nodes"]:
+            if n["action"] != "create" or (n["type"] == "Epic") != (stage == "Epic"):
+                continue
+            if n["epic"] and not n["epic"]["key"]:
+                skip(n, n["type"], f"{n['summary']}: Epic '{n['epic']['summary']}' could not be created", writer)
+            else:
+                creates.append(n)
+        chunks = [creates[i:i + BULK_CREATE_SIZE] for i in range(0, len(creates), BULK_CREATE_SIZE)]
+        run_logged(create_chunk, chunks, writer, workers)
+
+    # --- Epic link updates
+    def relink(n, log):
+        if not n["epic"]["key"]:
+            skip(n, n["type"], f"{n['key']}: Epic '{n['epic']['summary']}' could not be created", log)
+            return
+        done(n, ok=update_epic_link(n["key"], n["epic"]["key"], epic_link_field, log))
+
+    run_logged(relink, [n for n in plan["nodes"] if n["action"] == "update_epic"], writer, workers)
+
+    # --- Issue links
+    def add_link(l, log):
+        source_key = l["source"]["key"]
+        if l["invalid"]:
+            skip(l, "Link", f"{source_key or l['source']['summary']} → {l['target']}: target issue does not exist", log)
+        elif not source_key:
+            skip(l, "Link", f"{l['source']['type']} '{l['source']['summary']}' does not exist", log)
+        elif l["exists"]:
+            log.writerow(log_row("Link Exists", source_key, "Link", l["target"], "Already linked"))
+            done(l)
+        else:
+            done(l, ok=create_issue_link(source_key, l["target"], l["type"], log))
+
+    run_logged(add_link, plan["links"], writer, workers)
@@ -0,0 +1,137 @@
+import json
+import re
+import sys
+
+from config import JIRA_SUBTASK_TEMPLATES
+
+# Sub-tasks every parent gets when no template matches
+REQUIRED_SUBTASKS = ["[Task] Implement", "[Task] Review", "[Task] Test"]
+
+_templates_path = JIRA_SUBTASK_TEMPLATES
+_templates = None
+_PREFIX = re.compile(r"^\s*\[[^\]]*\]\s*")
+
+
+def set_templates_path(path):
+    """Use the sub-task templates of this JSON file instead of JIRA_SUBTASK_TEMPLATES (read and checked now)."""
+    global _templates_path, _templates
+    _templates_path = path
+    _templates = load_templates(path)
+
+
+# ------------------------------------------------------------
+# Templates
+# ------------------------------------------------------------
+def load_templates(path):
+    """
+    Read a sub-task template file:
+
+        {"default": ["[Task] Implement", "[Task] Review", "[Task] Test"],
+         "types": {"Bug": ["[Bug] Reproduce", "[Bug] Fix", "[Bug] Verify"]},
+         "projects": {"ABC": {"default": [...], "types": {"Story": [...]}}}}
+
+    Every key is optional; issue type names are case-insensitive.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except OSError as e:
+        print(f"❌ Cannot read sub-task templates {path}: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ Invalid JSON in sub-task templates {path}: {e}")
+        sys.exit(1)
+
+    def names_ok(names):
+        return names is None or (isinstance(names, list) and all(isinstance(n, str) and n.strip() for n in names))
+
+    def section(value, where):
+        types = (value.get("types") or {}) if isinstance(value, dict) else None
+        if not isinstance(types, dict) or not names_ok(value.get("default")) \
+                or not all(names_ok(names) for names in types.values()):
+            print(f"❌ Invalid sub-task templates in {where} of {path}")
+            print('   Expected {"default": [names], "types": {"<Issue Type>": [names]}}.')
+            sys.exit(1)
+        return {"default": value.get("default"), "types": {t.lower(): n for t, n in types.items()}}
+
+    projects = data.get("projects") or {} if isinstance(data, dict) else None
+    if not isinstance(projects, dict):
+        print(f"❌ Invalid sub-task templates {path}: expected an object with optional "
+              '"default", "types" and "projects".')
+        sys.exit(1)
+    return {
+        **section(data, "the top level"),
+        "projects": {p: section(v, f"project {p}") for p, v in projects.items()},
+    }
+
+
+def get_templates():
+    global _templates
+    if _templates is None:
+        _templates = load_templates(_templates_path) if _templates_path else \
+            {"default": None, "types": {}, "projects": {}}
+    return _templates
+
+
+def template_for(project_key, issue_type):
+    """
+    Sub-task names for a parent: the project's entry for the issue type, the
+    project default, the global entry for the type, the global default, then
+    REQUIRED_SUBTASKS.
+    """
+    templates = get_templates()
+    project = templates["projects"].get(project_key) or {"default": None, "types": {}}
+    issue_type = (issue_type or "").lower()
+    for names in (project["types"].get(issue_type), project["default"],
+                  templates["types"].get(issue_type), templates["default"]):
+        if names is not None:
+            return names
+    return REQUIRED_SUBTASKS
+
+
+# ------------------------------------------------------------
+# Reconciliation
+# ------------------------------------------------------------
+def loose_name(summary):
+    """Summary without a leading [Prefix], case and extra whitespace: 'implement' matches '[Task] Implement'."""
+    return " ".join(_PREFIX.sub("", summary or "").split()).lower()
+
+
+def reconcile_subtasks(subtasks, template, fix_drift=False):
+    """
+    Diff a parent's existing sub-tasks against its template with set lookups.
+    A name is present when a sub-task has that summary ignoring case and
+    surrounding spaces. Returns (missing, drifted): the names to create, and
+    (sub-task key, current summary, template name) for sub-tasks that differ
+    from a name in case, spacing or [Prefix]. A [Prefix]/spacing match only
+    replaces the missing name with fix_drift (it is renamed instead); without
+    it the name is still created. Each sub-task satisfies at most one name.
+    """
+    exact = {}
+    loose = {}
+    for s in subtasks:
+        summary = s.get("fields", {}).get("summary", "")
+        exact.setdefault(summary.strip().lower(), []).append(s)
+        loose.setdefault(loose_name(summary), []).append(s)
+
+    def unused(candidates):
+        return next((s for s in candidates if s["key"] not in used), None)
+
+    used = set()
+    missing, drifted, pending = [], [], []
+    for name in template:
+        match = unused(exact.get(name.strip().lower(), []))
+        if match is None:
+            pending.append(name)
+            continue
+        used.add(match["key"])
+        if match["fields"]["summary"].strip() != name.strip():
+            drifted.append((match["key"], match["fields"]["summary"], name))
+    for name in pending:
+        match = unused(loose.get(loose_name(name), []))
+        if match is not None:
+            used.add(match["key"])
+            drifted.append((match["key"], match["fields"]["summary"], name))
+        if match is None or not fix_drift:
+            missing.append(name)
+    return missing, drifted
@@ -1,26 +1,117 @@
-from jira_api import jira_request
-
-def bulk_replace_text_in_project(project_key, old_text, new_text):
-    jql = f'project = "{project_key}" AND (summary ~ "{old_text}" OR description ~ "{old_text}")'
-    resp = jira_request("GET", f"search?jql={jql}&maxResults=500&fields=summary,description")
-    if resp.status_code != 200:
-        print(f"Failed: {resp.status_code}")
-        return
-
-    for issue in resp.json().get("issues", []):
-        key = issue["key"]
-        fields = issue["fields"]
-        summary = fields.get("summary", "")
-        description = fields.get("description", "")
-        updated = False
-
-        if old_text in summary:
-            summary = summary.replace(old_text, new_text)
-            updated = True
-        if old_text in description:
-            description = description.replace(old_text, new_text)
-            updated = True
-
-        if updated:
-            put_resp = jira_request("PUT", f"issue/{key}", json={"fields": {"summary": summary, "description": description}})
-            print(f"Updated {key}" if put_resp.status_code == 204 else f"Failed {key}: {put_resp.text[:100]}")
+import difflib
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from jira_api import IncompleteResultsError, jira_request, search_issues_by_key
+from metrics_utils import instrumented
+from mirror_utils import get_mirror
+
+TEXT_FIELDS = ("summary", "description")
+REPLACE_WORKERS = 8  # parallel PUTs
+
+def compile_pattern(old_text, regex=False, ignore_case=False):
+    return re.compile(old_text if regex else re.escape(old_text), re.IGNORECASE if ignore_case else 0)
+
+def replace_jql(project_key, old_text, regex=False):
+    """
+    JQL for the issues to scan. Jira's text search pre-filters literal matches
+    (it is case-insensitive and word-based, so results are re-checked locally);
+    a regex cannot be expressed in JQL, so regex mode scans the whole project.
+    """
+    jql = f'project = "{project_key}"'
+    if not regex:
+        escaped = old_text.replace("\\", "\\\\").replace('"', '\\"')
+        jql += f' AND (summary ~ "{escaped}" OR description ~ "{escaped}")'
+    return jql
+
+def changed_fields(fields, pattern, replacement):
+    """Return {field: new value} for the text fields the replacement actually changes."""
+    changes = {}
+    for name in TEXT_FIELDS:
+        value = fields.get(name)
+        if not value:
+            continue
+        new_value = pattern.sub(replacement, value)
+        if new_value != value:
+            changes[name] = new_value
+    return changes
+
+def print_diff(issue_key, fields, changes):
+    for name, new_value in changes.items():
+        diff = difflib.unified_diff(
+            (fields.get(name) or "").splitlines(),
+            new_value.splitlines(),
+            fromfile=f"{issue_key} {name}",
+            tofile=f"{issue_key} {name} (new)",
+            lineterm="",
+        )
+        print("\n".join(diff))
+
+def update_fields(issue_key, changes):
+    put_resp = jira_request("PUT", f"issue/{issue_key}", json={"fields": changes})
+    if put_resp.status_code == 204:
+        mirror = get_mirror()
+        if mirror and "summary" in changes:
+            mirror.set_summary(issue_key, changes["summary"])
+        print(f"Updated {issue_key} ({', '.join(changes)})")
+        return True
+    print(f"Failed {issue_key}: {put_resp.text[:100]}")
+    return False
+
+@instrumented("Bulk text replace")
+def bulk_replace_text_in_project(project_key, old_text, new_text, regex=False, ignore_case=False,
+                                 preview=False, workers=REPLACE_WORKERS):
+    """
+    Replace old_text with new_text in the summary and description of every issue
+    in the project. Issues are streamed page by page in key order and updated
+    while the next pages are read, with up to `workers` PUTs in flight; each PUT
+    sends only the fields that changed.
+
+    regex=True treats old_text as a regular expression (new_text may use \\1 groups),
+    ignore_case=True matches regardless of case, preview=True prints a diff of
+    every change instead of updating anything.
+    """
+    # Literal mode must not interpret backslashes in new_text
+    replacement = new_text if regex else (lambda match: new_text)
+    try:
+        pattern = compile_pattern(old_text, regex, ignore_case)
+    except re.error as e:
+        print(f"❌ Invalid regular expression '{old_text}': {e}")
+        return None
+    try:
+        # Parses the replacement's group references before any issue is read
+        pattern.sub(replacement, "")
+    except re.error as e:
+        print(f"❌ Invalid replacement '{new_text}': {e}")
+        return None
+
+    scanned, changed, futures, incomplete = 0, 0, [], None
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        try:
+            for issue in search_issues_by_key(replace_jql(project_key, old_text, regex), "summary,description"):
+                scanned += 1
+                changes = changed_fields(issue["fields"], pattern, replacement)
+                if not changes:
+                    continue
+                changed += 1
+                if preview:
+                    print_diff(issue["key"], issue["fields"], changes)
+                else:
+                    futures.append(pool.submit(update_fields, issue["key"], changes))
+        except IncompleteResultsError as e:
+            incomplete = e
+        updated = sum(1 for f in futures if f.result())
+
+    print(f"\n🔎 Scanned {scanned} issues, {changed} with matching text.")
+    if preview:
+        print("📋 Preview only: nothing was updated.")
+    else:
+        print(f"✅ Updated {updated} issues" + (f", ❌ {len(futures) - updated} failed." if updated < len(futures) else "."))
+    if incomplete:
+        print(f"❌ {incomplete}")
+        print(f"   Not every issue of {project_key} was scanned; run the replacement again to finish.")
+        sys.exit(1)
+    if preview:
+        return {"scanned": scanned, "changed": changed, "updated": 0, "failed": 0}
+    return {"scanned": scanned, "changed": changed, "updated": updated, "failed": len(futures) - updated}